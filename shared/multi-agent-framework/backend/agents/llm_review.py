@@ -8,6 +8,9 @@ from backend.chat_memory import ChatMemory
 
 logger = logging.getLogger(__name__)
 
+# Extensions of the files the reviewer looks at
+_REVIEW_EXTENSIONS = frozenset({'py', 'js', 'ts'})
+
 class LLMReviewAgent(BaseAgent):
     """Agent that reviews code using LLM or heuristics."""
     
@@ -22,7 +25,8 @@ class LLMReviewAgent(BaseAgent):
         suggestions = []
         
         for file in files:
-            if not file['path'].endswith(('.py', '.js', '.ts')):
+            path = file['path']
+            if '.' not in path or path.rpartition('.')[2] not in _REVIEW_EXTENSIONS:
                 continue
 
             content = file['content']
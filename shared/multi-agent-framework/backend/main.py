@@ -2,7 +2,7 @@ from typing import Any, Dict, List, Optional
 
 from backend.db.database import SessionLocal
 from backend.db.models import ReviewSession, Suggestion
-from backend.orchestrator import AgentOrchestrator, apply_patch_to_file
+from backend.orchestrator import AgentOrchestrator, apply_patch_to_content
 from backend.services.github import GitHubAPI
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Query
@@ -130,6 +130,7 @@ async def review_code(req: ReviewRequest) -> ReviewResponse:
 async def apply_patch(req: ApplyPatchRequest):
     """Apply the code patch for the given suggestion ID."""
     db = SessionLocal()
+    github = None
     try:
         # Get the suggestion and its session
         suggestion = db.query(Suggestion).get(req.suggestion_id)
@@ -158,57 +159,10 @@ async def apply_patch(req: ApplyPatchRequest):
         if not file_content:
             raise HTTPException(status_code=404, detail=f"File {suggestion.file_path} not found")
 
-        # Apply the patch using a temporary file
-        import tempfile
-        import os
-
-        # Create temporary files for the patch process
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as original_file, \
-             tempfile.NamedTemporaryFile(mode='w', delete=False) as patch_file:
-            
-            # Write original content
-            original_file.write(file_content)
-            original_file.flush()
-            original_file_path = original_file.name
-            
-            # Write patch content
-            patch_file.write(suggestion.patch)
-            patch_file.flush()
-            patch_file_path = patch_file.name
-        
-        try:
-            # Apply patch using our custom function instead of subprocess
-            with open(original_file_path, 'r') as f:
-                original_content = f.read()
-                
-            # Apply the patch to the content
-            from backend.orchestrator import apply_patch_to_file
-            
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Create a temporary file structure similar to the repo
-                os.makedirs(os.path.dirname(os.path.join(temp_dir, suggestion.file_path)), exist_ok=True)
-                with open(os.path.join(temp_dir, suggestion.file_path), 'w') as f:
-                    f.write(original_content)
-                
-                # Apply the patch
-                success = apply_patch_to_file(suggestion.patch, temp_dir)
-                if not success:
-                    raise HTTPException(status_code=500, detail="Failed to apply patch")
-                
-                # Read the patched content
-                with open(os.path.join(temp_dir, suggestion.file_path), 'r') as f:
-                    patched_content = f.read()
-        
-        except Exception as e:
-            logger.error(f"Failed to apply patch: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Failed to apply patch: {str(e)}")
-        finally:
-            # Clean up temp files
-            try:
-                os.unlink(original_file_path)
-                os.unlink(patch_file_path)
-            except Exception as e:
-                logger.warning(f"Error cleaning up temp files: {str(e)}")
+        # Apply the patch to the content in memory
+        patched_content = apply_patch_to_content(suggestion.patch, file_content)
+        if patched_content is None:
+            raise HTTPException(status_code=500, detail="Failed to apply patch")
 
         # Create a commit with the changes
         try:
@@ -234,6 +188,8 @@ async def apply_patch(req: ApplyPatchRequest):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         db.close()
+        if github is not None:
+            await github.close()
 
 @app.get("/summary", response_model=SummaryResponse)
 def get_summary(session_id: Optional[int] = Query(None)):
@@ -256,6 +212,7 @@ def get_summary(session_id: Optional[int] = Query(None)):
 async def create_branch(req: CreateBranchRequest):
     """Create a new branch for a suggestion."""
     db = SessionLocal()
+    github = None
     try:
         # Get the suggestion and its session
         suggestion = db.query(Suggestion).get(req.suggestion_id)
@@ -304,11 +261,14 @@ async def create_branch(req: CreateBranchRequest):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         db.close()
+        if github is not None:
+            await github.close()
 
 @app.post("/github/create-pr", response_model=CreatePRResponse)
 async def create_pr(req: CreatePRRequest):
     """Create a pull request for a suggestion."""
     db = SessionLocal()
+    github = None
     try:
         # Get the suggestion and its session
         suggestion = db.query(Suggestion).get(req.suggestion_id)
@@ -359,3 +319,5 @@ async def create_pr(req: CreatePRRequest):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         db.close()
+        if github is not None:
+            await github.close()
@@ -1,4 +1,3 @@
-import difflib
 import logging
 import os
 import re
@@ -18,6 +17,8 @@ from backend.services.github import GitHubAPI
 
 logger = logging.getLogger(__name__)
 
+_HUNK_RE = re.compile(r'^@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+
 class AgentOrchestrator:
     def __init__(self):
         self.chat_memory = ChatMemory()
@@ -42,87 +43,86 @@ class AgentOrchestrator:
         repo_path: Optional[str] = None,
     ) -> Tuple[ReviewSession, List[Dict[str, Any]]]:
         """Run code review using all agents."""
-        logger.info(f"Initialized {len(self.agents)} agents")
+        # If github_info is provided, use it to construct repo_path
+        session_repo_path = repo_path
+        if github_info:
+            session_repo_path = f"{github_info['owner']}/{github_info['repo']}"
+
+        # If files not provided but github_info is, fetch files from GitHub
+        if not files and github_info:
+            async with GitHubAPI(github_info['token']) as github:
+                files = await github.analyze_repository(
+                    github_info['owner'],
+                    github_info['repo']
+                )
         
-        # Create a new review session
+        async def _run_agent(agent):
+            agent_name = agent.__class__.__name__
+            logger.info(f"Running {agent_name}")
+            kwargs = dict(
+                structure=structure,
+                files=files,
+                github_info=github_info,
+                repo_path=repo_path
+            )
+            try:
+                # Await coroutine agents directly; move sync agents off
+                # the event loop so they can overlap with the others
+                if asyncio.iscoroutinefunction(agent.run):
+                    suggestions = await agent.run(self.chat_memory, **kwargs)
+                else:
+                    suggestions = await asyncio.to_thread(agent.run, self.chat_memory, **kwargs)
+                logger.info(f"Received {len(suggestions)} suggestions from {agent_name}")
+                return agent_name, suggestions
+            except Exception as e:
+                logger.error(f"Error running {agent_name}: {str(e)}", exc_info=True)
+                return agent_name, []
+
+        # Run all agents concurrently; gather keeps results in agent order
+        agent_results = await asyncio.gather(*[_run_agent(agent) for agent in self.agents])
+
+        # The session and its suggestions are written only once the agents are
+        # done, so the SQLite write lock is held for one short transaction
+        # rather than for the whole fetch and review
         db = SessionLocal()
         try:
-            # If github_info is provided, use it to construct repo_path
-            session_repo_path = repo_path
-            if github_info:
-                session_repo_path = f"{github_info['owner']}/{github_info['repo']}"
-            
             session = ReviewSession(
                 repo_path=session_repo_path,
                 summary=""  # Initialize with empty summary
             )
             db.add(session)
-            db.commit()
-            db.refresh(session)
-            
-            # If files not provided but github_info is, fetch files from GitHub
-            if not files and github_info:
-                github = GitHubAPI(github_info['token'])
-                files = await github.analyze_repository(
-                    github_info['owner'],
-                    github_info['repo']
+            db.flush()  # Populates session.id; committed with the suggestions below
+
+            # Suggestions keep the actual agent class name and are written in
+            # one batch
+            db_suggestions = [
+                Suggestion(
+                    session_id=session.id,
+                    agent=agent_name,
+                    message=suggestion.get('message', ''),
+                    patch=suggestion.get('patch'),
+                    file_path=suggestion.get('file_path'),
+                    status='pending'
                 )
+                for agent_name, suggestions in agent_results
+                for suggestion in suggestions
+            ]
             
-            all_suggestions = []
+            db.add_all(db_suggestions)
+            db.flush()  # Populates the database-generated IDs
             
-            # Run each agent
-            for agent in self.agents:
-                agent_name = agent.__class__.__name__
-                logger.info(f"Running {agent_name}")
-                
-                try:
-                    # Check if agent's run method is a coroutine
-                    if asyncio.iscoroutinefunction(agent.run):
-                        suggestions = await agent.run(
-                            self.chat_memory,
-                            structure=structure,
-                            files=files,
-                            github_info=github_info,
-                            repo_path=repo_path
-                        )
-                    else:
-                        suggestions = agent.run(
-                            self.chat_memory,
-                            structure=structure,
-                            files=files,
-                            github_info=github_info,
-                            repo_path=repo_path
-                        )
-                    
-                    logger.info(f"Received {len(suggestions)} suggestions from {agent_name}")
-                    
-                    # Store suggestions in database with proper agent name and IDs
-                    for suggestion in suggestions:
-                        db_suggestion = Suggestion(
-                            session_id=session.id,
-                            agent=agent_name,  # Use the actual agent class name
-                            message=suggestion.get('message', ''),
-                            patch=suggestion.get('patch'),
-                            file_path=suggestion.get('file_path'),
-                            status='pending'
-                        )
-                        db.add(db_suggestion)
-                        db.commit()
-                        db.refresh(db_suggestion)
-                        
-                        # Add the suggestion with its new ID to all_suggestions
-                        all_suggestions.append({
-                            'id': db_suggestion.id,  # Use the database-generated ID
-                            'agent': agent_name,
-                            'message': suggestion.get('message', ''),
-                            'patch': suggestion.get('patch'),
-                            'file_path': suggestion.get('file_path'),
-                            'status': 'pending'
-                        })
-                        
-                except Exception as e:
-                    logger.error(f"Error running {agent_name}: {str(e)}", exc_info=True)
-                    continue
+            all_suggestions = [
+                {
+                    'id': db_suggestion.id,
+                    'agent': db_suggestion.agent,
+                    'message': db_suggestion.message,
+                    'patch': db_suggestion.patch,
+                    'file_path': db_suggestion.file_path,
+                    'status': db_suggestion.status
+                }
+                for db_suggestion in db_suggestions
+            ]
+            db.commit()
             
             # Generate summary using MetaReviewAgent
             meta_agent = next((a for a in self.agents if isinstance(a, MetaReviewAgent)), None)
@@ -140,6 +140,64 @@ class AgentOrchestrator:
         finally:
             db.close()
 
+def _apply_hunks(lines: List[str], original_lines: List[str]) -> List[str]:
+    """Apply the hunks in the patch lines to the original lines and return the patched lines."""
+    new_lines = []
+    pointer = 0
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('--- ') or line.startswith('+++ '):
+            i += 1
+            continue
+
+        if line.startswith('@@'):
+            m = _HUNK_RE.match(line)
+            if m:
+                orig_start = int(m.group(1))
+            else:
+                orig_start = 1
+            logging.debug("Found hunk header: %s -> original_start=%d", line, orig_start)
+
+            orig_index = orig_start - 1
+            if pointer < orig_index:
+                logging.debug("Copying unchanged lines from pointer=%d to orig_index=%d", pointer, orig_index)
+                new_lines.extend(original_lines[pointer:orig_index])
+                pointer = orig_index
+
+            i += 1
+            while i < len(lines) and not lines[i].startswith('@@'):
+                hunk_line = lines[i]
+                if hunk_line.startswith(' '):
+                    new_lines.append(hunk_line[1:] + "\n")
+                    pointer += 1
+                elif hunk_line.startswith('-'):
+                    pointer += 1
+                elif hunk_line.startswith('+'):
+                    new_lines.append(hunk_line[1:] + "\n")
+                i += 1
+        else:
+            i += 1
+
+    if pointer < len(original_lines):
+        logging.debug("Copying remaining lines from pointer=%d to end (total %d).",
+                      pointer, len(original_lines))
+        new_lines.extend(original_lines[pointer:])
+
+    return new_lines
+
+def apply_patch_to_content(patch: str, original: str) -> Optional[str]:
+    """
+    Apply a unified diff patch string to the given file content in memory.
+    Returns the patched content, or None if the patch is empty or names no file.
+    """
+    lines = patch.splitlines()
+    if not any(line.startswith('+++ ') for line in lines):
+        logging.debug("Could not parse target file from patch. No '+++ ' line found.")
+        return None
+    return "".join(_apply_hunks(lines, original.splitlines(keepends=True)))
+
 def apply_patch_to_file(patch: str, repo_path: str) -> bool:
     """
     Apply a unified diff patch string to the file in the given repository path.
@@ -184,49 +242,7 @@ def apply_patch_to_file(patch: str, repo_path: str) -> bool:
         logging.debug("Exception reading file %s: %s", file_path, e)
         return False
 
-    new_lines = []
-    pointer = 0
-    i = 0
-
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith('--- ') or line.startswith('+++ '):
-            i += 1
-            continue
-
-        if line.startswith('@@'):
-            import re
-            m = re.match(r'^@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@', line)
-            if m:
-                orig_start = int(m.group(1))
-            else:
-                orig_start = 1
-            logging.debug("Found hunk header: %s -> original_start=%d", line, orig_start)
-
-            orig_index = orig_start - 1
-            if pointer < orig_index:
-                logging.debug("Copying unchanged lines from pointer=%d to orig_index=%d", pointer, orig_index)
-                new_lines.extend(original_lines[pointer:orig_index])
-                pointer = orig_index
-
-            i += 1
-            while i < len(lines) and not lines[i].startswith('@@'):
-                hunk_line = lines[i]
-                if hunk_line.startswith(' '):
-                    new_lines.append(hunk_line[1:] + "\n")
-                    pointer += 1
-                elif hunk_line.startswith('-'):
-                    pointer += 1
-                elif hunk_line.startswith('+'):
-                    new_lines.append(hunk_line[1:] + "\n")
-                i += 1
-        else:
-            i += 1
-
-    if pointer < len(original_lines):
-        logging.debug("Copying remaining lines from pointer=%d to end (total %d).",
-                      pointer, len(original_lines))
-        new_lines.extend(original_lines[pointer:])
+    new_lines = _apply_hunks(lines, original_lines)
 
     try:
         with open(file_path, 'w') as f:
@@ -1,12 +1,41 @@
-import base64
+import asyncio
+import json
 import logging
-from typing import Any, Dict, List
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# Faster drop-in replacement, used when installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# File extensions analyze_repository fetches for review
+SOURCE_EXTENSIONS = frozenset({'.py', '.js', '.ts', '.tsx', '.jsx'})
+# The same as suffixes, and their last characters; checking the last
+# character first rejects most other files without any string scan
+_SOURCE_SUFFIXES = tuple(SOURCE_EXTENSIONS)
+_SOURCE_LAST_CHARS = frozenset(ext[-1] for ext in SOURCE_EXTENSIONS)
+
+# Media type that makes GitHub send file bodies as-is rather than base64 in JSON
+RAW_MEDIA_TYPE = 'application/vnd.github.raw'
+
+# Maximum number of file bodies kept in GitHubAPI's shared content cache
+CONTENT_CACHE_SIZE = 4096
+
+# Concurrent requests made while walking a repository with the contents API
+WALK_WORKERS = 20
+
 class GitHubAPI:
+    # Shared across instances so repeated reviews of a repository reuse earlier
+    # downloads. Contents entries are revalidated with their ETag; blob entries
+    # are keyed by SHA and never go stale.
+    _content_cache: 'OrderedDict[tuple, Dict[str, Any]]' = OrderedDict()
+
     def __init__(self, access_token: str = None):
         """Initialize with optional access token from user session."""
         self.base_url = "https://api.github.com"
@@ -14,81 +43,259 @@ class GitHubAPI:
             'Accept': 'application/vnd.github.v3+json',
             'Authorization': f'token {access_token}' if access_token else ''
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Fetches this instance is running, so overlapping calls for the same
+        # file share one request. Kept per instance: a fetch runs with this
+        # instance's token and session, so other callers must not join it.
+        self._inflight: Dict[tuple, 'asyncio.Future[Any]'] = {}
+
+    async def ensure_session(self) -> aiohttp.ClientSession:
+        """Get or lazily create the shared session so connections are reused across calls."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session, if one was opened."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        """Context manager support."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Close the shared session on exit."""
+        await self.close()
+
+    def _cache_get(self, key: tuple) -> Dict[str, Any] | None:
+        """Look up a cached response, marking it as recently used."""
+        entry = self._content_cache.get(key)
+        if entry is not None:
+            self._content_cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: tuple, entry: Dict[str, Any]) -> None:
+        """Store a response, evicting the least recently used entries past the limit."""
+        self._content_cache[key] = entry
+        self._content_cache.move_to_end(key)
+        while len(self._content_cache) > CONTENT_CACHE_SIZE:
+            self._content_cache.popitem(last=False)
+
+    async def _single_flight(self, key: tuple, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fetch, or join the identical fetch already in flight for key."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so a cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _get_json(self, url: str, params: Dict[str, str] | None = None) -> Tuple[int, Any]:
+        """
+        GET a JSON resource, revalidating a cached copy by its ETag. GitHub
+        does not charge 304 responses against the rate limit; they are
+        reported as a 200 with the cached body.
+        """
+        key = ('json', url, tuple(sorted((params or {}).items())))
+        cached = self._cache_get(key)
+        headers = {'If-None-Match': cached['etag']} if cached else {}
+
+        session = await self.ensure_session()
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 304 and cached:
+                return 200, cached['data']
+            if response.status != 200:
+                return response.status, None
+            data = json_loads(await response.read())
+            etag = response.headers.get('ETag')
+            if etag:
+                self._cache_put(key, {'etag': etag, 'data': data})
+            return 200, data
 
     async def get_repository_contents(self, owner: str, repo: str, path: str = "") -> List[Dict[str, Any]]:
         """Get repository contents at a given path."""
         logger.info(f"Fetching contents for {owner}/{repo} at path: {path}")
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-            async with session.get(url, headers=self.headers) as response:
-                if response.status == 404:
-                    logger.error(f"Path {path} not found in {owner}/{repo}")
-                    return []
-                data = await response.json()
-                return data if isinstance(data, list) else [data]
+        status, data = await self._get_json(f"{self.base_url}/repos/{owner}/{repo}/contents/{path}")
+        if status != 200:
+            logger.error(f"Path {path} not found in {owner}/{repo}")
+            return []
+        return data if isinstance(data, list) else [data]
 
     async def get_file_content(self, owner: str, repo: str, path: str) -> str | None:
-        """Get file content directly from GitHub API."""
-        logger.info(f"Fetching file content for {owner}/{repo}/{path}")
-        async with aiohttp.ClientSession() as session:
+        """Get file content directly from GitHub API, revalidating cached copies by ETag."""
+        key = ('contents', owner, repo, path)
+
+        async def fetch() -> str | None:
+            logger.info(f"Fetching file content for {owner}/{repo}/{path}")
+            cached = self._cache_get(key)
+            headers = {'Accept': RAW_MEDIA_TYPE}
+            if cached:
+                headers['If-None-Match'] = cached['etag']
+
+            session = await self.ensure_session()
             url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-            async with session.get(url, headers=self.headers) as response:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    return cached['content']
                 if response.status == 404:
                     logger.warning(f"File {path} not found in {owner}/{repo}")
                     return None
-                data = await response.json()
-                if isinstance(data, dict) and 'content' in data:
-                    return base64.b64decode(data['content']).decode('utf-8')
-                return None
+                # Directories still come back as a JSON listing
+                if response.status != 200 or response.content_type == 'application/json':
+                    return None
+                content = (await response.read()).decode('utf-8')
+                etag = response.headers.get('ETag')
+                if etag:
+                    self._cache_put(key, {'etag': etag, 'content': content})
+                return content
+
+        return await self._single_flight(key, fetch)
+
+    async def list_tree(self, owner: str, repo: str) -> List[Dict[str, Any]] | None:
+        """List every blob on the default branch with a single recursive Git Trees call.
+
+        Returns None if the tree cannot be listed in full (request failed or
+        GitHub truncated the response).
+        """
+        branch = await self.get_default_branch(owner, repo)
+        commit_sha = await self.get_ref_sha(owner, repo, branch)
+        if not commit_sha:
+            return None
+
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{commit_sha}"
+        status, data = await self._get_json(url, params={'recursive': '1'})
+        if status != 200:
+            logger.error(f"Failed to get tree for {owner}/{repo}: {status}")
+            return None
+
+        if data.get('truncated'):
+            logger.warning(f"Tree for {owner}/{repo} is truncated, falling back to the contents API")
+            return None
+        return [item for item in data.get('tree', []) if item.get('type') == 'blob']
+
+    async def get_blob_content(self, owner: str, repo: str, sha: str) -> str | None:
+        """Get a file's content by blob SHA."""
+        key = ('blob', owner, repo, sha)
+        cached = self._cache_get(key)
+        if cached:
+            return cached['content']
+
+        async def fetch() -> str | None:
+            session = await self.ensure_session()
+            url = f"{self.base_url}/repos/{owner}/{repo}/git/blobs/{sha}"
+            async with session.get(url, headers={'Accept': RAW_MEDIA_TYPE}) as response:
+                if response.status != 200:
+                    logger.warning(f"Blob {sha} not found in {owner}/{repo}")
+                    return None
+                content = (await response.read()).decode('utf-8')
+                self._cache_put(key, {'content': content})
+                return content
+
+        return await self._single_flight(key, fetch)
 
     async def analyze_repository(self, owner: str, repo: str) -> List[Dict[str, Any]]:
         """Analyze repository contents recursively from GitHub API."""
         logger.info(f"Starting analysis of {owner}/{repo}")
-        analyzed_files = []
-        paths_to_check = ['']  # Start with root
-
-        while paths_to_check:
-            current_path = paths_to_check.pop(0)
-            contents = await self.get_repository_contents(owner, repo, current_path)
-
-            for item in contents:
-                if item['type'] == 'dir':
-                    paths_to_check.append(item['path'])
-                elif item['type'] == 'file':
-                    if item['path'].endswith(('.py', '.js', '.ts', '.tsx', '.jsx')):
+
+        # One tree call enumerates the whole repository; only the matching
+        # blobs then need fetching
+        blobs = await self.list_tree(owner, repo)
+        if blobs is None:
+            analyzed_files = await self._walk_contents(owner, repo)
+        else:
+            files_to_fetch = [
+                blob for blob in blobs
+                if blob['path'][-1:] in _SOURCE_LAST_CHARS and blob['path'].endswith(_SOURCE_SUFFIXES) and
+                blob.get('size', 0) <= 1024 * 1024  # Skip files > 1MB
+            ]
+            file_contents = await asyncio.gather(
+                *(self.get_blob_content(owner, repo, blob['sha']) for blob in files_to_fetch)
+            )
+            analyzed_files = [
+                {
+                    'path': blob['path'],
+                    'content': content,
+                    'type': 'file',
+                    'size': blob.get('size', 0)
+                }
+                for blob, content in zip(files_to_fetch, file_contents)
+                if content
+            ]
+
+        logger.info(f"Completed analysis of {owner}/{repo}. Found {len(analyzed_files)} files.")
+        return analyzed_files
+
+    async def _walk_contents(self, owner: str, repo: str) -> List[Dict[str, Any]]:
+        """
+        Walk the repository with the contents API. A pool of workers drains
+        one queue of directories to list and files to fetch, so no depth
+        waits on the slowest request of the one before it.
+        """
+        # Each entry carries the indexes that lead to it from the root; sorting
+        # on them gives the same breadth-first order as a level-by-level walk
+        queue: asyncio.Queue = asyncio.Queue()
+        found: List[Tuple[Tuple[int, ...], Dict[str, Any]]] = []
+
+        async def work() -> None:
+            while True:
+                order, item = await queue.get()
+                try:
+                    if item['type'] == 'dir':
+                        contents = await self.get_repository_contents(owner, repo, item['path'])
+                        for index, child in enumerate(contents):
+                            if child['type'] == 'dir' or (
+                                    child['type'] == 'file' and
+                                    child['path'][-1:] in _SOURCE_LAST_CHARS and child['path'].endswith(_SOURCE_SUFFIXES) and
+                                    child.get('size', 0) <= 1024 * 1024):  # Skip files > 1MB
+                                queue.put_nowait((order + (index,), child))
+                    else:
                         content = await self.get_file_content(owner, repo, item['path'])
                         if content:
-                            analyzed_files.append({
+                            found.append((order, {
                                 'path': item['path'],
                                 'content': content,
                                 'type': 'file',
                                 'size': item.get('size', 0)
-                            })
+                            }))
+                finally:
+                    queue.task_done()
 
-        logger.info(f"Completed analysis of {owner}/{repo}. Found {len(analyzed_files)} files.")
-        return analyzed_files
+        queue.put_nowait(((), {'type': 'dir', 'path': ''}))  # Start with root
+        workers = [asyncio.ensure_future(work()) for _ in range(WALK_WORKERS)]
+        finished = asyncio.ensure_future(queue.join())
+        try:
+            # Workers only stop by raising, which ends the walk with that error
+            done, _ = await asyncio.wait([finished, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in [finished, *workers]:
+                task.cancel()
+
+        found.sort(key=lambda entry: (len(entry[0]), entry[0]))
+        return [file for _, file in found]
 
     async def get_default_branch(self, owner: str, repo: str) -> str:
         """Get the default branch of a repository."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}"
-            async with session.get(url, headers=self.headers) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get repository info: {response.status}")
-                    return "main"  # Default fallback
-                data = await response.json()
-                return data.get('default_branch', 'main')
+        status, data = await self._get_json(f"{self.base_url}/repos/{owner}/{repo}")
+        if status != 200:
+            logger.error(f"Failed to get repository info: {status}")
+            return "main"  # Default fallback
+        return data.get('default_branch', 'main')
 
     async def get_ref_sha(self, owner: str, repo: str, ref: str) -> str | None:
         """Get the SHA of a reference (branch, tag, etc.)."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{ref}"
-            async with session.get(url, headers=self.headers) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get ref SHA: {response.status}")
-                    return None
-                data = await response.json()
-                return data.get('object', {}).get('sha')
+        status, data = await self._get_json(f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{ref}")
+        if status != 200:
+            logger.error(f"Failed to get ref SHA: {status}")
+            return None
+        return data.get('object', {}).get('sha')
 
     async def create_branch(self, owner: str, repo: str, base_branch: str, new_branch: str) -> bool:
         """Create a new branch from a base branch."""
@@ -101,24 +308,24 @@ class GitHubAPI:
             return False
 
         # Create the new branch
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/git/refs"
-            data = {
-                "ref": f"refs/heads/{new_branch}",
-                "sha": base_sha
-            }
-            try:
-                async with session.post(url, headers=self.headers, json=data) as response:
-                    response_text = await response.text()
-                    logger.debug(f"Create branch response: {response.status}, {response_text[:200]}...")
-                    
-                    if response.status != 201:
-                        logger.error(f"Failed to create branch: {response.status}, {response_text}")
-                        return False
-                    return True
-            except Exception as e:
-                logger.error(f"Exception creating branch: {str(e)}")
-                return False
+        session = await self.ensure_session()
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/refs"
+        data = {
+            "ref": f"refs/heads/{new_branch}",
+            "sha": base_sha
+        }
+        try:
+            async with session.post(url, json=data) as response:
+                response_text = await response.text()
+                logger.debug(f"Create branch response: {response.status}, {response_text[:200]}...")
+                
+                if response.status != 201:
+                    logger.error(f"Failed to create branch: {response.status}, {response_text}")
+                    return False
+                return True
+        except Exception as e:
+            logger.error(f"Exception creating branch: {str(e)}")
+            return False
 
     async def create_pull_request(
         self,
@@ -130,20 +337,82 @@ class GitHubAPI:
         base: str
     ) -> str | None:
         """Create a pull request."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/pulls"
-            data = {
-                "title": title,
-                "body": body,
-                "head": head,
-                "base": base
+        session = await self.ensure_session()
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls"
+        data = {
+            "title": title,
+            "body": body,
+            "head": head,
+            "base": base
+        }
+        async with session.post(url, json=data) as response:
+            if response.status != 201:
+                logger.error(f"Failed to create PR: {response.status}")
+                return None
+            pr_data = await response.json()
+            return pr_data.get('html_url')
+
+    async def commit_files(
+        self,
+        owner: str,
+        repo: str,
+        branch: str,
+        files: List[Tuple[str, str]],
+        message: str
+    ) -> bool:
+        """
+        Commit (path, content) pairs to a branch as a single commit using the
+        Git Data API: one tree carrying every file, one commit and one ref
+        update, however many files there are.
+        """
+        logger.info(f"Committing {len(files)} files to {owner}/{repo} on branch {branch}")
+
+        session = await self.ensure_session()
+        repo_url = f"{self.base_url}/repos/{owner}/{repo}"
+        try:
+            # Head commit and its tree in one call
+            async with session.get(f"{repo_url}/commits/{branch}") as response:
+                if response.status != 200:
+                    logger.error(f"Failed to get head of {branch}: {response.status}, {await response.text()}")
+                    return False
+                head = await response.json()
+            parent_sha = head['sha']
+            base_tree = head['commit']['tree']['sha']
+
+            # File contents go inline in the tree entries, so GitHub creates
+            # the blobs without a request per file
+            tree_data = {
+                "base_tree": base_tree,
+                "tree": [
+                    {"path": path, "mode": "100644", "type": "blob", "content": content}
+                    for path, content in files
+                ]
             }
-            async with session.post(url, headers=self.headers, json=data) as response:
+            async with session.post(f"{repo_url}/git/trees", json=tree_data) as response:
                 if response.status != 201:
-                    logger.error(f"Failed to create PR: {response.status}")
-                    return None
-                pr_data = await response.json()
-                return pr_data.get('html_url')
+                    logger.error(f"Failed to create tree: {response.status}, {await response.text()}")
+                    return False
+                tree_sha = (await response.json())['sha']
+
+            commit_data = {
+                "message": message,
+                "tree": tree_sha,
+                "parents": [parent_sha]
+            }
+            async with session.post(f"{repo_url}/git/commits", json=commit_data) as response:
+                if response.status != 201:
+                    logger.error(f"Failed to create commit: {response.status}, {await response.text()}")
+                    return False
+                commit_sha = (await response.json())['sha']
+
+            async with session.patch(f"{repo_url}/git/refs/heads/{branch}", json={"sha": commit_sha}) as response:
+                if response.status != 200:
+                    logger.error(f"Failed to update {branch}: {response.status}, {await response.text()}")
+                    return False
+            return True
+        except Exception as e:
+            logger.error(f"Exception committing files to {branch}: {str(e)}")
+            return False
 
     async def update_file(
         self,
@@ -156,50 +425,4 @@ class GitHubAPI:
     ) -> bool:
         """Update a file in the repository."""
         logger.info(f"Updating file {path} in {owner}/{repo} on branch {branch}")
-        
-        # First get the current file to get its SHA
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-            try:
-                async with session.get(url, headers=self.headers, params={'ref': branch}) as response:
-                    if response.status == 404:
-                        logger.error(f"File {path} not found in {owner}/{repo}")
-                        return False
-                    
-                    response_text = await response.text()
-                    logger.debug(f"Get file response: {response.status}, {response_text[:200]}...")
-                    
-                    if response.status != 200:
-                        logger.error(f"Failed to get file {path}: {response.status}, {response_text}")
-                        return False
-                    
-                    data = await response.json()
-                    if not isinstance(data, dict) or 'sha' not in data:
-                        logger.error(f"Invalid response when getting file {path}: {data}")
-                        return False
-                    current_sha = data['sha']
-            except Exception as e:
-                logger.error(f"Exception getting file {path}: {str(e)}")
-                return False
-
-        # Now update the file
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-            data = {
-                "message": message,
-                "content": base64.b64encode(content.encode()).decode(),
-                "sha": current_sha,
-                "branch": branch
-            }
-            try:
-                async with session.put(url, headers=self.headers, json=data) as response:
-                    response_text = await response.text()
-                    logger.debug(f"Update file response: {response.status}, {response_text[:200]}...")
-                    
-                    if response.status != 200 and response.status != 201:
-                        logger.error(f"Failed to update file: {response.status}, {response_text}")
-                        return False
-                    return True
-            except Exception as e:
-                logger.error(f"Exception updating file {path}: {str(e)}")
-                return False
+        return await self.commit_files(owner, repo, branch, [(path, content)], message)
@@ -1,6 +1,11 @@
+import hashlib
+import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
 
 from backend.chat_memory import ChatMemory
 
@@ -8,13 +13,37 @@ from backend.agents.base import BaseAgent
 
 logger = logging.getLogger(__name__)
 
+# Conversation turns kept in memory, and re-sent to the model with each query
+CONTEXT_HISTORY_TURNS = 32
+CONTEXT_WINDOW_TURNS = 8
+# A directory with more files than this of one extension gets a single summary line
+TREE_AGGREGATE_THRESHOLD = 20
+# Extensions of the files listed in the files summary
+SUMMARY_EXTENSIONS = frozenset({'py', 'js', 'ts', 'tsx'})
+# Formatted trees kept by structure digest, shared by all assistants
+FORMATTED_TREE_CACHE_SIZE = 64
+
+# The formatted tree depends only on the structure, so it is cached at module
+# level; conversation state stays on each assistant instance
+_formatted_trees: 'OrderedDict[str, str]' = OrderedDict()
+
+@dataclass(slots=True)
+class ContextMessage:
+    """One turn of the assistant's conversation history."""
+    role: str
+    content: str
+
 class ArchitectureAssistant(BaseAgent):
     """AI Assistant for architecture analysis and suggestions."""
     
     def __init__(self):
         super().__init__()
-        self.conversation_context = []  # Store conversation history
+        self.conversation_context: Deque[ContextMessage] = deque(maxlen=CONTEXT_HISTORY_TURNS)  # Store conversation history
         self.last_structure = None      # Cache last analyzed structure
+        self.last_files = None          # Files sent with last_structure
+        self._structure_sha = None      # Digest of last_structure
+        self._tree_structure = None     # Formatted last_structure
+        self._repo_context = None       # Prompt prefix built from the tree and files summary
         
     async def analyze_structure(
         self,
@@ -25,50 +54,13 @@ class ArchitectureAssistant(BaseAgent):
     ) -> Dict[str, Any]:
         """Analyze project structure and provide architecture suggestions."""
         try:
-            # Store structure for context
-            self.last_structure = structure
-            
-            # Format the complete tree structure first
-            tree_structure = self._format_structure(structure)
-            
-            if not tree_structure:
+            messages = self._prepare_messages(structure, files, query)
+            if messages is None:
                 return self._error_response("Could not parse repository structure")
 
-            # Add to conversation context
-            self.conversation_context.append({
-                'role': 'system',
-                'content': f"Project structure analyzed:\n{tree_structure}"
-            })
-
-            if query:
-                self.conversation_context.append({
-                    'role': 'user',
-                    'content': query
-                })
-
             try:
-                import openai
-                openai.api_key = os.environ.get('OPENAI_API_KEY')
-                
-                # Include full conversation context in the prompt
-                messages = [
-                    {"role": "system", "content": "You are an expert software architect specializing in analyzing and improving project structures. Maintain context of previous messages."},
-                    *self.conversation_context,
-                ]
+                ai_response = "".join([part async for part in self._stream_completion(messages)])
 
-                response = await openai.ChatCompletion.acreate(
-                    model="gpt-4o-mini",
-                    messages=messages
-                )
-                
-                ai_response = response.choices[0].message.content
-                
-                # Add AI response to context
-                self.conversation_context.append({
-                    'role': 'assistant',
-                    'content': ai_response
-                })
-                
                 return {
                     'suggestions': ai_response,
                     'type': 'analysis',
@@ -89,6 +81,104 @@ class ArchitectureAssistant(BaseAgent):
             logger.error(f"Error in architecture analysis: {str(e)}")
             return self._error_response(str(e))
 
+    async def analyze_structure_stream(
+        self,
+        chat_memory: ChatMemory,
+        structure: Dict[str, Any],
+        files: List[Dict[str, Any]],
+        query: str = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the analysis chunk by chunk as the model produces it. Errors
+        are raised instead of being returned as an error response.
+        """
+        messages = self._prepare_messages(structure, files, query)
+        if messages is None:
+            raise ValueError("Could not parse repository structure")
+        async for part in self._stream_completion(messages):
+            yield part
+
+    def _prepare_messages(
+        self, structure: Dict[str, Any], files: List[Dict[str, Any]], query: Optional[str]
+    ) -> Optional[List[Dict[str, str]]]:
+        """Record the query in the conversation context and build the prompt, or None if the structure cannot be formatted."""
+        # The repository context opens every prompt and is only rebuilt when
+        # the tree or files change, so follow-up turns share the same prefix
+        # and the API's prompt cache can reuse it instead of re-reading it.
+        # A structure passed back as last_structure is known to be unchanged.
+        if structure is self.last_structure and self._structure_sha is not None:
+            structure_sha = self._structure_sha
+        else:
+            structure_sha = hashlib.sha1(
+                json.dumps(structure, sort_keys=True, default=str).encode()
+            ).hexdigest()[:12]
+
+        if structure_sha == self._structure_sha:
+            tree_structure = self._tree_structure
+            marker = f"(tree unchanged, sha={structure_sha})"
+        else:
+            tree_structure = _formatted_trees.get(structure_sha)
+            if tree_structure is None:
+                tree_structure = self._format_structure(structure)
+                _formatted_trees[structure_sha] = tree_structure
+                while len(_formatted_trees) > FORMATTED_TREE_CACHE_SIZE:
+                    _formatted_trees.popitem(last=False)
+            else:
+                _formatted_trees.move_to_end(structure_sha)
+            marker = f"Project structure analyzed (sha={structure_sha})"
+
+        if not tree_structure:
+            return None
+
+        if tree_structure is not self._tree_structure or files != self.last_files:
+            self._repo_context = (
+                f"Project structure analyzed (sha={structure_sha}):\n{tree_structure}\n\n"
+                f"Files Overview:\n{self._format_files_summary(files)}"
+            )
+
+        # Store structure for context
+        self.last_structure = structure
+        self.last_files = files
+        self._structure_sha = structure_sha
+        self._tree_structure = tree_structure
+
+        # Add to conversation context; the history only refers to the tree
+        # by digest so it is not repeated for every past turn
+        self.conversation_context.append(ContextMessage('system', marker))
+
+        if query:
+            self.conversation_context.append(ContextMessage('user', query))
+
+        # Include the current context and the recent conversation in the prompt
+        history = self.conversation_context
+        recent = islice(history, max(0, len(history) - CONTEXT_WINDOW_TURNS), None)
+        return [
+            {"role": "system", "content": "You are an expert software architect specializing in analyzing and improving project structures. Maintain context of previous messages."},
+            {"role": "system", "content": self._repo_context},
+            *({"role": m.role, "content": m.content} for m in recent),
+        ]
+
+    async def _stream_completion(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream the model's reply, adding it to the conversation context once complete."""
+        import openai
+        openai.api_key = os.environ.get('OPENAI_API_KEY')
+
+        response = await openai.ChatCompletion.acreate(
+            model="gpt-4o-mini",
+            messages=messages,
+            stream=True
+        )
+
+        parts = []
+        async for chunk in response:
+            content = chunk.choices[0].delta.get('content')
+            if content:
+                parts.append(content)
+                yield content
+
+        # Add AI response to context
+        self.conversation_context.append(ContextMessage('assistant', "".join(parts)))
+
     def _error_response(self, message: str) -> Dict[str, Any]:
         """Create standardized error response."""
         return {
@@ -100,8 +190,12 @@ class ArchitectureAssistant(BaseAgent):
 
     def clear_context(self):
         """Clear the conversation context."""
-        self.conversation_context = []
+        self.conversation_context.clear()
         self.last_structure = None
+        self.last_files = None
+        self._structure_sha = None
+        self._tree_structure = None
+        self._repo_context = None
 
     def _generate_initial_analysis(self, tree_structure: str, files: List[Dict[str, Any]]) -> str:
         """Generate initial analysis text."""
@@ -182,59 +276,86 @@ Files Overview:
 
     def _format_structure(self, structure: Dict[str, Any]) -> str:
         """Format project structure with accurate stats and minimal tokens."""
-        formatted_tree = []
-        stats = {
-            'files': 0,
-            'dirs': 0,
-            'by_type': {},
-            'by_dir': {}
-        }
-        
-        def format_node(node: Dict[str, Any], prefix: str = "", is_last: bool = True) -> None:
-            name = node.get("path", "") or node.get("name", "")
-            node_type = node.get("type", "")
-            
-            if not name:
-                return
-            
-            # Update stats
-            if node_type == "directory":
-                stats['dirs'] += 1
-                dir_name = name.split('/')[0]
-                stats['by_dir'][dir_name] = stats['by_dir'].get(dir_name, 0) + 1
-            else:
-                stats['files'] += 1
-                ext = name.split('.')[-1] if '.' in name else 'no_ext'
-                stats['by_type'][ext] = stats['by_type'].get(ext, 0) + 1
-            
-            # Format tree line
-            line_prefix = prefix + ("+" if is_last else "|") + "-- "
-            formatted_tree.append(f"{line_prefix}{name}")
-            
-            # Process children
-            if node_type == "directory" and "children" in node:
-                children = node["children"]
-                for i, child in enumerate(children):
-                    is_last_child = i == len(children) - 1
-                    child_prefix = prefix + ("    " if is_last else "|   ")
-                    format_node(child, child_prefix, is_last_child)
-
-        # Process root
+        formatted_tree: List[str] = []
+        append = formatted_tree.append
+        file_types: Counter = Counter()
+        dir_count = 0
+
+        def resolve(children: List[Dict[str, Any]], dirname: str) -> List[Any]:
+            """
+            Read each child's name, type and children once and count it.
+            Entries are (label, children) tuples, or None for nameless nodes;
+            large groups of same-extension files become one summary entry.
+            """
+            nonlocal dir_count
+            entries: List[Any] = []
+            exts: List[Optional[str]] = []
+            for child in children:
+                name = child.get("path") or child.get("name")
+                if not name:
+                    entries.append(None)
+                    exts.append(None)
+                elif child.get("type") == "directory":
+                    dir_count += 1
+                    entries.append((name, child.get("children")))
+                    exts.append(None)
+                else:
+                    ext = name.rpartition('.')[2] if '.' in name else 'no_ext'
+                    file_types[ext] += 1
+                    entries.append((name, None))
+                    exts.append(ext if ext != 'no_ext' else None)
+
+            groups = Counter(ext for ext in exts if ext)
+            large = {ext for ext, count in groups.items() if count > TREE_AGGREGATE_THRESHOLD}
+            if not large:
+                return entries
+
+            collapsed = []
+            for entry, ext in zip(entries, exts):
+                if ext not in large:
+                    collapsed.append(entry)
+                elif ext in groups:
+                    # The group's first file stands in for all of them
+                    count = groups.pop(ext)
+                    collapsed.append((f"{dirname}/*.{ext} ({count} files)" if dirname else f"*.{ext} ({count} files)", None))
+            return collapsed
+
         if isinstance(structure, dict):
-            if "children" in structure:
-                for i, child in enumerate(structure["children"]):
-                    format_node(child, "", i == len(structure["children"]) - 1)
-            else:
-                format_node(structure)
+            roots = structure["children"] if "children" in structure else [structure]
         elif isinstance(structure, list):
-            for i, item in enumerate(structure):
-                format_node(item, "", i == len(structure) - 1)
+            roots = structure
+        else:
+            roots = []
+        entries = resolve(roots, "")
+
+        # Walk the tree in pre-order with an explicit stack of
+        # (entry, prefix, is_last); children are pushed in reverse so they
+        # pop in their original order
+        last = len(entries) - 1
+        stack = [(entries[i], "", i == last) for i in range(last, -1, -1)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            entry, prefix, is_last = pop()
+            if entry is None:
+                continue
+
+            name, children = entry
+            append(f"{prefix}{'+' if is_last else '|'}-- {name}")
+
+            if children is not None:
+                entries = resolve(children, name)
+                child_prefix = prefix + ("    " if is_last else "|   ")
+                last = len(entries) - 1
+                for i in range(last, -1, -1):
+                    push((entries[i], child_prefix, i == last))
+
+        file_count = sum(file_types.values())
 
         # Create header with accurate stats
         header = [
             "Project Structure:",
-            f"Total: {stats['files'] + stats['dirs']} items ({stats['files']} files, {stats['dirs']} directories)",
-            f"File types: {', '.join(f'{ext}: {count}' for ext, count in sorted(stats['by_type'].items()) if ext in ['ts', 'tsx', 'js', 'py'])}",
+            f"Total: {file_count + dir_count} items ({file_count} files, {dir_count} directories)",
+            f"File types: {', '.join(f'{ext}: {count}' for ext, count in sorted(file_types.items()) if ext in ['ts', 'tsx', 'js', 'py'])}",
             "---"
         ]
 
@@ -245,9 +366,9 @@ Files Overview:
         if not files:
             return "No files available for analysis."
             
-        summary_lines = []
-        for file in files:
-            if file.get('path', '').endswith(('.py', '.js', '.ts', '.tsx')):
-                summary_lines.append(f"- {file['path']}")
-        
-        return "\n".join(summary_lines) if summary_lines else "No relevant source files found."
+        summary = "\n".join(
+            f"- {path}"
+            for file in files
+            if '.' in (path := file.get('path', '')) and path.rpartition('.')[2] in SUMMARY_EXTENSIONS
+        )
+        return summary or "No relevant source files found."
@@ -1,10 +1,14 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from backend.chat_memory import ChatMemory
 
 
 class BaseAgent:
     """Base agent interface."""
+
+    # Class names of agents whose run must finish before this one starts;
+    # agents with no dependencies between them run concurrently
+    depends_on: Tuple[str, ...] = ()
     
     async def run(
         self,
@@ -1,87 +1,369 @@
 import ast
-import difflib
+import asyncio
+import hashlib
 import logging
+import multiprocessing
 import os
-from typing import Any, Dict, List, Optional
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, AnyStr, Dict, List, Optional, Set, Tuple
 
 from backend.agents.base import BaseAgent
+from backend.agents.patching import EditedLines
 from backend.chat_memory import ChatMemory
 
 logger = logging.getLogger(__name__)
 
-class LintingAgent(BaseAgent):
-    def _create_patch(self, content: str, file_path: str) -> Optional[Dict[str, Any]]:
-        """Create a clean patch to convert prints to logging."""
-        try:
-            tree = ast.parse(content)
-            content_lines = content.splitlines(keepends=True)
-            
-            # Find imports and prints
-            has_logging = False
-            has_logger = False
-            print_nodes = []
-            logging_lines = set()
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    if any(n.name == 'logging' for n in node.names):
-                        has_logging = True
-                elif isinstance(node, ast.Assign):
-                    if isinstance(node.targets[0], ast.Name) and node.targets[0].id == 'logger':
-                        has_logger = True
-                elif isinstance(node, ast.Call):
-                    if isinstance(node.func, ast.Name):
-                        if node.func.id == 'print':
-                            print_nodes.append(node)
-                            continue
-                    if (isinstance(node.func, ast.Attribute) and
-                        isinstance(node.func.value, ast.Name) and
-                        node.func.value.id == 'logger'):
-                        logging_lines.add(node.lineno)
-
-            # Skip if no prints or if already logged
-            if not print_nodes or all(node.lineno in logging_lines for node in print_nodes):
+# Cheap pre-filter: files without a match cannot contain a print() call,
+# see _may_call_print()
+_PRINT_CALL_RE = re.compile(r'\bprint\s*\(')
+_PRINT_CALL_BYTES_RE = re.compile(rb'\bprint\s*\(')
+
+# Files shorter than the shortest print call are not read; files over the
+# upper limit (mostly generated code) are skipped with a warning
+_MIN_LINT_SIZE = len('print()')
+_MAX_LINT_SIZE = 2_000_000
+
+# Directories analyze_local skips entirely
+_SKIP_DIRS = frozenset({
+    '.venv', 'venv', '.env', 'node_modules', '__pycache__',
+    'site-packages', 'dist-packages', '.git',
+})
+
+# analyze_local lints in worker processes from this many files on, in batches
+_PARALLEL_MIN_FILES = 64
+_PARALLEL_BATCH_SIZE = 16
+# Threads reading files ahead of the linting
+_READ_WORKERS = 8
+
+# Fields that never hold statements or expressions: names, operators,
+# contexts and other scalars. _PrintFinder does not descend into them.
+_SCALAR_FIELDS = frozenset({
+    'ctx', 'op', 'ops', 'id', 'attr', 'arg', 'name', 'names', 'module', 'level',
+    'kind', 'type_comment', 'conversion', 'simple', 'is_async', 'tag',
+})
+
+# Per node class, the fields _PrintFinder descends into
+_CHILD_FIELDS = {
+    cls: tuple(field for field in cls._fields if field not in _SCALAR_FIELDS)
+    for cls in (getattr(ast, name) for name in dir(ast))
+    if isinstance(cls, type) and issubclass(cls, ast.AST)
+}
+_CHILD_FIELDS[ast.Constant] = ()
+
+def _child_nodes(node: ast.AST) -> List[ast.AST]:
+    """The nodes directly below node, in source order, from the fields _PrintFinder descends into."""
+    children = []
+    for field in _CHILD_FIELDS.get(node.__class__, node._fields):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            children.extend(item for item in value if isinstance(item, ast.AST))
+        elif isinstance(value, ast.AST):
+            children.append(value)
+    return children
+
+class _PrintFinder(ast.NodeVisitor):
+    """
+    Everything the print-to-logging rewrite needs from a module, gathered in
+    one traversal. Handlers are looked up by node class in a table and only
+    fields that can hold code are descended into. Handlers only inspect
+    their node; the traversal itself visits the children.
+    """
+
+    def __init__(self):
+        self.print_nodes: List[ast.Call] = []
+        self.imports_logging = False               # 'import logging'
+        self.from_logging = False                  # 'from logging import ...'
+        self.has_logger = False                    # 'logger = ...'
+        self.logger_call_lines: Set[int] = set()   # Lines with logger.<method>(...)
+        self._unparsed: Dict[int, str] = {}        # ast.unparse() results by node id
+
+    def visit(self, node: ast.AST) -> None:
+        handler = _PRINT_FINDER_HANDLERS.get(node.__class__)
+        if handler is not None:
+            handler(self, node)
+        self.generic_visit(node)
+
+    def generic_visit(self, node: ast.AST) -> None:
+        # Depth-first with an explicit stack, since generated code can nest
+        # deeper than the recursion limit; children are pushed in reverse so
+        # they are handled in source order
+        handlers = _PRINT_FINDER_HANDLERS
+        stack = _child_nodes(node)
+        stack.reverse()
+        pop, extend = stack.pop, stack.extend
+        while stack:
+            node = pop()
+            handler = handlers.get(node.__class__)
+            if handler is not None:
+                handler(self, node)
+            children = _child_nodes(node)
+            children.reverse()
+            extend(children)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        if any(n.name == 'logging' for n in node.names):
+            self.imports_logging = True
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module == 'logging':
+            self.from_logging = True
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        if isinstance(node.targets[0], ast.Name) and node.targets[0].id == 'logger':
+            self.has_logger = True
+
+    def visit_Call(self, node: ast.Call) -> None:
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id == 'print':
+                self.print_nodes.append(node)
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'logger':
+            self.logger_call_lines.add(node.lineno)
+
+    def unparse(self, node: ast.AST) -> str:
+        """
+        ast.unparse() of a node found by this scan, computed once. The finder
+        keeps its nodes alive, so their ids are stable keys.
+        """
+        source = self._unparsed.get(id(node))
+        if source is None:
+            source = self._unparsed[id(node)] = ast.unparse(node)
+        return source
+
+# Node classes _PrintFinder handles itself, shared by all instances so a
+# finder costs no per-instance dispatch table
+_PRINT_FINDER_HANDLERS = {
+    ast.Import: _PrintFinder.visit_Import,
+    ast.ImportFrom: _PrintFinder.visit_ImportFrom,
+    ast.Assign: _PrintFinder.visit_Assign,
+    ast.Call: _PrintFinder.visit_Call,
+}
+
+def _may_call_print(content: AnyStr) -> bool:
+    """
+    Whether text or bytes may call print(), without parsing or tokenizing:
+    some pre-filter match must lie outside comment and doctest lines. Such
+    lines never hold code, whether or not they are inside a string.
+    """
+    if isinstance(content, bytes):
+        pattern, skip = _PRINT_CALL_BYTES_RE, (b'#', b'>>>')
+        lf, cr = b'\n', b'\r'
+    else:
+        pattern, skip = _PRINT_CALL_RE, ('#', '>>>')
+        lf, cr = '\n', '\r'
+    for match in pattern.finditer(content):
+        start = match.start()
+        line_start = max(content.rfind(lf, 0, start), content.rfind(cr, 0, start)) + 1
+        if not content[line_start:start].lstrip().startswith(skip):
+            return True
+    return False
+
+# Scanned modules per content digest, bounded LRU shared across runs. Only
+# the scan is kept, not the whole tree: it holds just the print() subtrees,
+# so a full cache does not slow down garbage collection.
+_PARSE_CACHE_SIZE = 512
+_parse_cache: 'OrderedDict[bytes, Tuple[_PrintFinder, List[str]]]' = OrderedDict()
+
+def _parse_cached(content: str) -> Tuple[_PrintFinder, List[str]]:
+    """
+    Parse and scan content and split it into lines, reusing the result for
+    content parsed before. Callers must not modify the results. Raises
+    RecursionError for code nested deeper than the parser or ast.unparse
+    allow.
+    """
+    key = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    parsed = _parse_cache.get(key)
+    if parsed is not None:
+        _parse_cache.move_to_end(key)
+        return parsed
+
+    finder = _PrintFinder()
+    finder.visit(ast.parse(content))
+    # ast.unparse recurses, so print arguments nested too deep for it fail
+    # here, where callers skip the file, rather than partway through a rewrite
+    for node in finder.print_nodes:
+        for arg in node.args:
+            if not isinstance(arg, (ast.Constant, ast.Name)):
+                finder.unparse(arg)
+    parsed = (finder, content.splitlines(keepends=True))
+    _parse_cache[key] = parsed
+    while len(_parse_cache) > _PARSE_CACHE_SIZE:
+        _parse_cache.popitem(last=False)
+    return parsed
+
+def _line_indents(content_lines: List[str], nodes: List[ast.Call]) -> Dict[int, int]:
+    """Indentation width of each line holding one of nodes, by 1-based line number, measured once per line."""
+    indents: Dict[int, int] = {}
+    for node in nodes:
+        if node.lineno not in indents:
+            line = content_lines[node.lineno - 1]
+            indents[node.lineno] = len(line) - len(line.lstrip())
+    return indents
+
+def _read_local_file(path: Tuple[str, str]) -> Optional[bytes]:
+    """Read a (file_path, rel_path) pair's file as bytes, or None if it cannot be read or is out of the size limits."""
+    file_path, rel_path = path
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _MIN_LINT_SIZE:
                 return None
+            if size > _MAX_LINT_SIZE:
+                logger.warning(f"Skipping {rel_path}: {size} bytes is over the lint size limit")
+                return None
+            return f.read()
+    except OSError as e:
+        logger.error(f"Error analyzing {rel_path}: {e}")
+        return None
 
-            # Create clean patch
-            new_lines = content_lines.copy()
-            offset = 0
+def _lint_local_file(data: bytes, rel_path: str) -> Optional[Dict[str, Any]]:
+    """Suggest replacing the prints in a local file's bytes with logging, or None if there is nothing to do."""
+    # Files without prints are never decoded
+    if not _may_call_print(data):
+        return None
+    try:
+        # Same text a text-mode open() gives, universal newlines included
+        content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        finder, content_lines = _parse_cached(content)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        # Not UTF-8, not valid Python, or nested too deep to parse
+        logger.error(f"Error analyzing {rel_path}: {e}")
+        return None
+    
+    # Check for print statements
+    print_nodes = finder.print_nodes
+    
+    if print_nodes:
+        # Create a patch to replace print statements with logging
+        new_lines = EditedLines(content_lines)
+        
+        # Add logging import if not present
+        if 'import logging' not in content and 'from logging import' not in content:
+            new_lines.insert(0, 'import logging\n\n')
+        
+        # Add logger setup if not present
+        logger_setup = 'logger = logging.getLogger(__name__)\n\n'
+        if logger_setup not in content:
+            # Find the best place to insert logger setup (after imports)
+            insert_pos = 0
+            for i, line in enumerate(new_lines):
+                if line.startswith(('import ', 'from ')):
+                    insert_pos = i + 1
+            new_lines.insert(insert_pos, logger_setup)
+        
+        # Replace print statements with logging
+        line_indents = _line_indents(content_lines, print_nodes)
+        for node in print_nodes:
+            start_line = node.lineno - 1  # Convert to 0-based index
             
-            # Add imports if needed
-            if not has_logging:
-                new_lines.insert(0, 'import logging\n')
-                offset += 1
-            if not has_logger:
-                new_lines.insert(offset, 'logger = logging.getLogger(__name__)\n')
-                offset += 1
+            # Get the original print statement
+            indentation = content_lines[start_line][:line_indents[node.lineno]]
             
-            # Replace prints not followed by logging
-            for node in print_nodes:
-                if node.lineno not in logging_lines:
-                    line_no = node.lineno - 1 + offset
-                    indent = len(content_lines[node.lineno - 1]) - len(content_lines[node.lineno - 1].lstrip())
-                    args = [ast.unparse(arg) for arg in node.args]
-                    log_msg = f"{' ' * indent}logger.info({', '.join(args)})\n"
-                    new_lines[line_no] = log_msg
-
-            # Generate minimal diff
-            diff = list(difflib.unified_diff(
-                content_lines,
-                new_lines,
-                fromfile=f"a/{file_path}",
-                tofile=f"b/{file_path}",
-                n=0  # No context lines
-            ))
-
-            if diff:
-                return {
-                    'message': f"Replace redundant print statements with logging in {file_path}",
-                    'file_path': file_path,
-                    'patch': '\n'.join(diff)
-                }
+            # Create the logging statement
+            args = []
+            for arg in node.args:
+                if isinstance(arg, ast.Constant):
+                    args.append(repr(arg.value))
+                elif isinstance(arg, ast.Name):
+                    args.append(arg.id)
+                else:
+                    args.append(finder.unparse(arg))
+            
+            log_msg = ', '.join(args)
+            new_line = f"{indentation}logger.info({log_msg})\n"
+            new_lines[start_line] = new_line
+        
+        # Generate unified diff
+        diff = new_lines.unified_diff(
+            fromfile=f"a/{rel_path}",
+            tofile=f"b/{rel_path}",
+            lineterm=''
+        )
+        
+        return {
+            'message': f"Replace print statements with logging in {rel_path}",
+            'file_path': rel_path,
+            'patch': '\n'.join(diff)
+        }
+    return None
 
-        except Exception as e:
-            logger.error(f"Error creating patch: {e}")
+def _lint_local_files(paths: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Lint (file_path, rel_path) pairs in order; also the unit of work for worker processes."""
+    suggestions = []
+    # Reads are overlapped with linting: the pool reads ahead while this
+    # thread parses what has arrived
+    with ThreadPoolExecutor(max_workers=_READ_WORKERS) as pool:
+        for (_, rel_path), data in zip(paths, pool.map(_read_local_file, paths)):
+            if data is None:
+                continue
+            suggestion = _lint_local_file(data, rel_path)
+            if suggestion is not None:
+                suggestions.append(suggestion)
+    return suggestions
+
+@lru_cache(maxsize=1)
+def _lint_pool() -> ProcessPoolExecutor:
+    """
+    Worker processes for analyze_local, started on first use and reused by
+    every review. They are spawned rather than forked, since the server
+    process runs threads.
+    """
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+
+class LintingAgent(BaseAgent):
+    def _create_patch(self, content_lines: List[str], finder: _PrintFinder, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Create a clean patch to convert prints to logging, from a file's lines
+        and its scan as returned by _parse_cached().
+        """
+        # Find imports and prints
+        has_logging = finder.imports_logging
+        has_logger = finder.has_logger
+        print_nodes = finder.print_nodes
+        logging_lines = finder.logger_call_lines
+
+        # Skip if no prints or if already logged
+        if not print_nodes or all(node.lineno in logging_lines for node in print_nodes):
+            return None
+
+        # Create clean patch
+        new_lines = EditedLines(content_lines)
+        offset = 0
+        
+        # Add imports if needed
+        if not has_logging:
+            new_lines.insert(0, 'import logging\n')
+            offset += 1
+        if not has_logger:
+            new_lines.insert(offset, 'logger = logging.getLogger(__name__)\n')
+            offset += 1
+        
+        # Replace prints not followed by logging
+        line_indents = _line_indents(content_lines, print_nodes)
+        for node in print_nodes:
+            if node.lineno not in logging_lines:
+                line_no = node.lineno - 1 + offset
+                indent = line_indents[node.lineno]
+                args = [finder.unparse(arg) for arg in node.args]
+                log_msg = f"{' ' * indent}logger.info({', '.join(args)})\n"
+                new_lines[line_no] = log_msg
+
+        # Generate minimal diff
+        diff = list(new_lines.unified_diff(
+            fromfile=f"a/{file_path}",
+            tofile=f"b/{file_path}",
+            n=0  # No context lines
+        ))
+
+        if diff:
+            return {
+                'message': f"Replace redundant print statements with logging in {file_path}",
+                'file_path': file_path,
+                'patch': '\n'.join(diff)
+            }
         return None
 
     async def analyze_files(
@@ -97,96 +379,84 @@ class LintingAgent(BaseAgent):
             if not file['path'].endswith('.py'):
                 continue
 
+            content = file['content']
+            if len(content) > _MAX_LINT_SIZE:
+                logger.warning(f"Skipping {file['path']}: {len(content)} characters is over the lint size limit")
+                continue
+            if not _may_call_print(content):
+                continue
             try:
-                content = file['content']
-                content_lines = content.splitlines(keepends=True)
-                tree = ast.parse(content)
-
-                # Find all print statements
-                print_nodes = []
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'print':
-                        print_nodes.append(node)
-
-                if print_nodes:
-                    # Create a copy of lines for modification
-                    new_lines = content_lines.copy()
-
-                    # Check if logging is already imported
-                    has_logging_import = False
-                    has_logger_setup = False
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.Import) and any(n.name == 'logging' for n in node.names):
-                            has_logging_import = True
-                        elif isinstance(node, ast.ImportFrom) and node.module == 'logging':
-                            has_logging_import = True
-                        elif isinstance(node, ast.Assign):
-                            if isinstance(node.targets[0], ast.Name) and node.targets[0].id == 'logger':
-                                has_logger_setup = True
-
-                    # Add logging import and setup if needed
-                    if not has_logging_import:
-                        new_lines.insert(0, 'import logging\n')
-                    if not has_logger_setup:
-                        new_lines.insert(1, 'logger = logging.getLogger(__name__)\n')
-                        if not new_lines[2].strip():  # Add a blank line after if there isn't one
-                            new_lines.insert(2, '\n')
-
-                    # Replace print statements with logging
-                    for node in print_nodes:
-                        # Calculate the correct line number
-                        start_line = node.lineno - 1  # Convert to 0-based index
-                        if not has_logging_import and not has_logger_setup:
-                            start_line += 2  # Adjust for added imports
-                        elif not has_logging_import or not has_logger_setup:
-                            start_line += 1  # Adjust for one added import
-
-                        # Get the original print statement
-                        original_line = content_lines[node.lineno - 1]
-                        indent = len(original_line) - len(original_line.lstrip())
-                        indentation = original_line[:indent]
-
-                        # Create the logging statement
-                        args = []
-                        for arg in node.args:
-                            if isinstance(arg, ast.Constant):
-                                args.append(repr(arg.value))
-                            elif isinstance(arg, ast.Name):
-                                args.append(f"{{{arg.id}}}")
-                            elif isinstance(arg, ast.JoinedStr):  # f-string
-                                args.append(ast.unparse(arg))
-                            else:
-                                args.append(f"{{{ast.unparse(arg)}}}")
-
-                        if len(args) == 1:
-                            log_msg = args[0]
-                        else:
-                            # Join with spaces and wrap in f-string if needed
-                            log_msg = 'f"' + ' '.join(args).replace('"', '\\"') + '"'
-
-                        # Replace the print statement with logging
-                        new_line = f"{indentation}logger.info({log_msg})\n"
-                        new_lines[start_line] = new_line
-
-                    # Generate unified diff
-                    diff = difflib.unified_diff(
-                        content_lines,
-                        new_lines,
-                        fromfile=f"a/{file['path']}",
-                        tofile=f"b/{file['path']}",
-                        lineterm=''
-                    )
-
-                    suggestions.append({
-                        'message': f"Replace print statements with logging in {file['path']}",
-                        'file_path': file['path'],
-                        'patch': '\n'.join(diff)
-                    })
-
-            except Exception as e:
+                finder, content_lines = _parse_cached(content)
+            except (SyntaxError, ValueError, RecursionError) as e:
                 logger.error(f"Error analyzing {file['path']}: {e}")
                 continue
 
+            # Find all print statements, and whether logging is already set up
+            print_nodes = finder.print_nodes
+
+            if print_nodes:
+                # Create a copy of lines for modification
+                new_lines = EditedLines(content_lines)
+
+                has_logging_import = finder.imports_logging or finder.from_logging
+                has_logger_setup = finder.has_logger
+
+                # Add logging import and setup if needed
+                if not has_logging_import:
+                    new_lines.insert(0, 'import logging\n')
+                if not has_logger_setup:
+                    new_lines.insert(1, 'logger = logging.getLogger(__name__)\n')
+                    if len(new_lines) > 2 and not new_lines[2].strip():  # Add a blank line after if there isn't one
+                        new_lines.insert(2, '\n')
+
+                # Replace print statements with logging
+                line_indents = _line_indents(content_lines, print_nodes)
+                for node in print_nodes:
+                    # Calculate the correct line number
+                    start_line = node.lineno - 1  # Convert to 0-based index
+                    if not has_logging_import and not has_logger_setup:
+                        start_line += 2  # Adjust for added imports
+                    elif not has_logging_import or not has_logger_setup:
+                        start_line += 1  # Adjust for one added import
+
+                    # Get the original print statement
+                    indentation = content_lines[node.lineno - 1][:line_indents[node.lineno]]
+
+                    # Create the logging statement
+                    args = []
+                    for arg in node.args:
+                        if isinstance(arg, ast.Constant):
+                            args.append(repr(arg.value))
+                        elif isinstance(arg, ast.Name):
+                            args.append(f"{{{arg.id}}}")
+                        elif isinstance(arg, ast.JoinedStr):  # f-string
+                            args.append(finder.unparse(arg))
+                        else:
+                            args.append(f"{{{finder.unparse(arg)}}}")
+
+                    if len(args) == 1:
+                        log_msg = args[0]
+                    else:
+                        # Join with spaces and wrap in f-string if needed
+                        log_msg = 'f"' + ' '.join(args).replace('"', '\\"') + '"'
+
+                    # Replace the print statement with logging
+                    new_line = f"{indentation}logger.info({log_msg})\n"
+                    new_lines[start_line] = new_line
+
+                # Generate unified diff
+                diff = new_lines.unified_diff(
+                    fromfile=f"a/{file['path']}",
+                    tofile=f"b/{file['path']}",
+                    lineterm=''
+                )
+
+                suggestions.append({
+                    'message': f"Replace print statements with logging in {file['path']}",
+                    'file_path': file['path'],
+                    'patch': '\n'.join(diff)
+                })
+
         return suggestions
 
     async def analyze_local(
@@ -196,110 +466,45 @@ class LintingAgent(BaseAgent):
         structure: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         # Local analysis logic
-        suggestions = []
-        
-        # Skip these directories entirely
-        SKIP_DIRS = {'.venv', 'venv', '.env', 'node_modules', '__pycache__', 
-                    'site-packages', 'dist-packages', '.git'}
+        paths = []
         
         repo_path = os.path.realpath(repo_path)
         for root, dirs, files in os.walk(repo_path):
-            # Remove excluded dirs from dirs list to prevent recursion into them
-            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
-            
-            # Skip if we're in an excluded directory
-            if any(skip_dir in root.split(os.sep) for skip_dir in SKIP_DIRS):
-                continue
-                
-            # Check if we're inside the project directory
-            if not os.path.realpath(root).startswith(repo_path):
-                continue
+            # Remove excluded dirs from dirs list to prevent recursion into
+            # them; os.walk does not follow symlinks, so every root visited
+            # is inside the project
+            dirs[:] = [d for d in dirs if d not in _SKIP_DIRS]
 
             for file in files:
                 if not file.endswith('.py'):
                     continue
                 file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, repo_path)
-                try:
-                    with open(file_path, 'r') as f:
-                        content = f.read()
-                    tree = ast.parse(content)
-                    
-                    # Check for print statements
-                    print_nodes = []
-                    content_lines = content.splitlines(keepends=True)
-                    
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'print':
-                            print_nodes.append(node)
-                    
-                    if print_nodes:
-                        # Create a patch to replace print statements with logging
-                        new_lines = content_lines.copy()
-                        
-                        # Add logging import if not present
-                        if 'import logging' not in content and 'from logging import' not in content:
-                            new_lines.insert(0, 'import logging\n\n')
-                        
-                        # Add logger setup if not present
-                        logger_setup = 'logger = logging.getLogger(__name__)\n\n'
-                        if logger_setup not in content:
-                            # Find the best place to insert logger setup (after imports)
-                            insert_pos = 0
-                            for i, line in enumerate(new_lines):
-                                if line.startswith(('import ', 'from ')):
-                                    insert_pos = i + 1
-                            new_lines.insert(insert_pos, logger_setup)
-                        
-                        # Replace print statements with logging
-                        for node in print_nodes:
-                            start_line = node.lineno - 1  # Convert to 0-based index
-                            
-                            # Get the original print statement
-                            original_line = content_lines[start_line]
-                            indent = len(original_line) - len(original_line.lstrip())
-                            indentation = original_line[:indent]
-                            
-                            # Create the logging statement
-                            args = []
-                            for arg in node.args:
-                                if isinstance(arg, ast.Constant):
-                                    args.append(repr(arg.value))
-                                elif isinstance(arg, ast.Name):
-                                    args.append(arg.id)
-                                else:
-                                    args.append(ast.unparse(arg))
-                            
-                            log_msg = ', '.join(args)
-                            new_line = f"{indentation}logger.info({log_msg})\n"
-                            new_lines[start_line] = new_line
-                        
-                        # Generate unified diff
-                        diff = difflib.unified_diff(
-                            content_lines,
-                            new_lines,
-                            fromfile=f"a/{rel_path}",
-                            tofile=f"b/{rel_path}",
-                            lineterm=''
-                        )
-                        
-                        suggestions.append({
-                            'message': f"Replace print statements with logging in {rel_path}",
-                            'file_path': rel_path,
-                            'patch': '\n'.join(diff)
-                        })
-                        
-                except Exception as e:
-                    logger.error(f"Error analyzing {rel_path}: {e}")
-                    continue
-                    
-        return suggestions
+                paths.append((file_path, os.path.relpath(file_path, repo_path)))
+
+        loop = asyncio.get_running_loop()
+        if len(paths) < _PARALLEL_MIN_FILES:
+            return await loop.run_in_executor(None, _lint_local_files, paths)
+
+        # Parsing and diffing are CPU-bound, so larger trees are linted in
+        # worker processes, in batches to amortize the pickling. A cancelled
+        # review leaves its running batches to finish in the pool.
+        pool = _lint_pool()
+        batches = await asyncio.gather(*(
+            loop.run_in_executor(pool, _lint_local_files, paths[i:i + _PARALLEL_BATCH_SIZE])
+            for i in range(0, len(paths), _PARALLEL_BATCH_SIZE)
+        ))
+        return [suggestion for batch in batches for suggestion in batch]
 
     def _get_all_files(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Depth-first with an explicit stack; items are pushed in reverse so
+        # files come out in tree order
         files = []
-        for item in items:
-            if item['type'] == 'file':
+        stack = items[::-1]
+        while stack:
+            item = stack.pop()
+            item_type = item['type']
+            if item_type == 'file':
                 files.append(item)
-            elif item['type'] == 'directory' and item.get('children'):
-                files.extend(self._get_all_files(item['children']))
+            elif item_type == 'directory' and item.get('children'):
+                stack.extend(reversed(item['children']))
         return files
@@ -1,6 +1,8 @@
+import hashlib
 import logging
 import os
 import re
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional
 
 from backend.agents.base import BaseAgent
@@ -8,6 +10,15 @@ from backend.chat_memory import ChatMemory
 
 logger = logging.getLogger(__name__)
 
+_PASSWORD_RE = re.compile(r'password\s*=\s*', flags=re.IGNORECASE)
+
+# Extensions of the files the reviewer looks at
+_REVIEW_EXTENSIONS = frozenset({'py', 'js', 'ts'})
+
+# Findings per (path, content hash), bounded LRU shared across reviews
+_FILE_RESULTS_SIZE = 2048
+_file_results: 'OrderedDict[tuple, List[Dict[str, Any]]]' = OrderedDict()
+
 class LLMReviewAgent(BaseAgent):
     """Agent that reviews code using LLM or heuristics."""
     
@@ -22,43 +33,60 @@ class LLMReviewAgent(BaseAgent):
         suggestions = []
         
         for file in files:
-            if not file['path'].endswith(('.py', '.js', '.ts')):
+            path = file['path']
+            if '.' not in path or path.rpartition('.')[2] not in _REVIEW_EXTENSIONS:
                 continue
 
-            content = file['content']
-            
-            # Check for TODO comments
-            if 'TODO' in content:
-                suggestions.append({
-                    'message': f"Found TODO comments in {file['path']}. Consider addressing them.",
-                    'file_path': file['path'],
-                    'patch': None
-                })
+            # Unchanged files reuse the findings from their last review
+            key = (file['path'], hashlib.sha256(file['content'].encode('utf-8')).hexdigest())
+            file_suggestions = _file_results.get(key)
+            if file_suggestions is None:
+                file_suggestions = self._review_file(file['path'], file['content'])
+                _file_results[key] = file_suggestions
+                while len(_file_results) > _FILE_RESULTS_SIZE:
+                    _file_results.popitem(last=False)
+            else:
+                _file_results.move_to_end(key)
+            suggestions.extend(dict(s) for s in file_suggestions)
+        
+        return suggestions
+
+    def _review_file(self, path: str, content: str) -> List[Dict[str, Any]]:
+        """Run the heuristic checks on a single file."""
+        suggestions = []
 
-            # Check for hardcoded password patterns
-            if re.search(r'password\s*=\s*', content, flags=re.IGNORECASE):
-                suggestions.append({
-                    'message': f"Possible hardcoded password or credentials in {file['path']}. Use secure storage or configuration.",
-                    'patch': None,
-                    'file_path': file['path']
-                })
+        # Check for TODO comments
+        if 'TODO' in content:
+            suggestions.append({
+                'message': f"Found TODO comments in {path}. Consider addressing them.",
+                'file_path': path,
+                'patch': None
+            })
 
-            # Check for eval/exec usage
-            if 'eval(' in content or 'exec(' in content:
-                suggestions.append({
-                    'message': f"Use of eval/exec detected in {file['path']}. Consider safer alternatives.",
-                    'patch': None,
-                    'file_path': file['path']
-                })
+        # Check for hardcoded password patterns
+        if _PASSWORD_RE.search(content):
+            suggestions.append({
+                'message': f"Possible hardcoded password or credentials in {path}. Use secure storage or configuration.",
+                'patch': None,
+                'file_path': path
+            })
+
+        # Check for eval/exec usage
+        if 'eval(' in content or 'exec(' in content:
+            suggestions.append({
+                'message': f"Use of eval/exec detected in {path}. Consider safer alternatives.",
+                'patch': None,
+                'file_path': path
+            })
+
+        # Check for very large file
+        if content.count('\n') > 300:
+            suggestions.append({
+                'message': f"{path} exceeds 300 lines; consider refactoring into smaller modules or classes.",
+                'patch': None,
+                'file_path': path
+            })
 
-            # Check for very large file
-            if content.count('\n') > 300:
-                suggestions.append({
-                    'message': f"{file['path']} exceeds 300 lines; consider refactoring into smaller modules or classes.",
-                    'patch': None,
-                    'file_path': file['path']
-                })
-        
         return suggestions
 
     async def analyze_local(
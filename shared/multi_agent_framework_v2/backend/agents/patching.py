@@ -0,0 +1,156 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class EditedLines:
+    """
+    A file's lines under edit, kept as the original lines plus the edits:
+    lines inserted before each original line, and replaced original lines.
+    Inserting does not shift the whole file, and the unified diff comes
+    straight from the edits instead of from matching the two versions with
+    difflib. Indices are those of the edited file, as with a list.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.original = lines
+        self._inserted: Dict[int, List[str]] = {}   # Lines inserted before original line i
+        self._replaced: Dict[int, str] = {}         # New text of original line i
+
+    def _locate(self, index: int) -> Tuple[int, Optional[List[str]], int]:
+        """
+        Where line index of the edited file is: (i, inserted, pos) for the
+        pos-th line inserted before original line i, or (i, None, 0) for
+        original line i itself.
+        """
+        shift = 0
+        for i in sorted(self._inserted):
+            inserted = self._inserted[i]
+            if index < i + shift:
+                break
+            if index < i + shift + len(inserted):
+                return i, inserted, index - i - shift
+            shift += len(inserted)
+        if not 0 <= index - shift < len(self.original):
+            raise IndexError('line index out of range')
+        return index - shift, None, 0
+
+    def __getitem__(self, index: int) -> str:
+        i, inserted, pos = self._locate(index)
+        if inserted is not None:
+            return inserted[pos]
+        return self._replaced.get(i, self.original[i])
+
+    def __setitem__(self, index: int, line: str) -> None:
+        i, inserted, pos = self._locate(index)
+        if inserted is not None:
+            inserted[pos] = line
+        elif line == self.original[i]:
+            self._replaced.pop(i, None)
+        else:
+            self._replaced[i] = line
+
+    def __iter__(self) -> Iterator[str]:
+        inserted, replaced = self._inserted, self._replaced
+        for i, line in enumerate(self.original):
+            if i in inserted:
+                yield from inserted[i]
+            yield replaced.get(i, line)
+        yield from inserted.get(len(self.original), ())
+
+    def __len__(self) -> int:
+        return len(self.original) + sum(map(len, self._inserted.values()))
+
+    def insert(self, index: int, line: str) -> None:
+        # Past the end appends, as with a list
+        index = min(index, len(self))
+        if index == len(self):
+            self._inserted.setdefault(len(self.original), []).append(line)
+            return
+        i, inserted, pos = self._locate(index)
+        if inserted is not None:
+            inserted.insert(pos, line)
+        else:
+            # Right before original line i, after what was inserted there
+            self._inserted.setdefault(i, []).append(line)
+
+    def _opcodes(self) -> Tuple[List[Tuple[str, int, int, int, int]], Dict[int, List[str]]]:
+        """
+        The edits as SequenceMatcher.get_opcodes() would describe them, and
+        the new lines of each change by the index it starts at.
+        """
+        codes: List[Tuple[str, int, int, int, int]] = []
+        added: Dict[int, List[str]] = {}
+        i = j = 0
+        for k in sorted(self._inserted.keys() | self._replaced.keys()):
+            if k > i:
+                codes.append(('equal', i, k, j, j + k - i))
+                j += k - i
+                i = k
+            lines = list(self._inserted.get(k, ()))
+            if k in self._replaced:
+                lines.append(self._replaced[k])
+            i2 = i + 1 if k in self._replaced else i
+            if codes and codes[-1][0] != 'equal':
+                # Adjacent to the previous change, so part of it
+                _, i1, _, j1, _ = codes.pop()
+                added[j1].extend(lines)
+            else:
+                i1, j1 = i, j
+                added[j1] = lines
+            j += len(lines)
+            codes.append(('replace' if i2 > i1 else 'insert', i1, i2, j1, j))
+            i = i2
+        if i < len(self.original):
+            codes.append(('equal', i, len(self.original), j, j + len(self.original) - i))
+        return codes, added
+
+    def unified_diff(self, fromfile: str, tofile: str, n: int = 3, lineterm: str = '\n') -> Iterator[str]:
+        """The edits as a unified diff, formatted like difflib.unified_diff(original, lines, ...)."""
+        codes, added = self._opcodes()
+        if not added:
+            return
+
+        # Group the edits into hunks with n lines of context, like
+        # SequenceMatcher.get_grouped_opcodes()
+        if codes[0][0] == 'equal':
+            tag, i1, i2, j1, j2 = codes[0]
+            codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+        if codes[-1][0] == 'equal':
+            tag, i1, i2, j1, j2 = codes[-1]
+            codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+        groups = []
+        group = []
+        for tag, i1, i2, j1, j2 in codes:
+            if tag == 'equal' and i2 - i1 > n + n:
+                group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+                groups.append(group)
+                group = []
+                i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+            group.append((tag, i1, i2, j1, j2))
+        if group and not (len(group) == 1 and group[0][0] == 'equal'):
+            groups.append(group)
+
+        a = self.original
+        yield f'--- {fromfile}{lineterm}'
+        yield f'+++ {tofile}{lineterm}'
+        for group in groups:
+            first, last = group[0], group[-1]
+            yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@{lineterm}'
+            for tag, i1, i2, j1, j2 in group:
+                if tag == 'equal':
+                    for line in a[i1:i2]:
+                        yield ' ' + line
+                    continue
+                for line in a[i1:i2]:
+                    yield '-' + line
+                for line in added[j1]:
+                    yield '+' + line
+
+
+def _format_range(start: int, stop: int) -> str:
+    """A hunk's line range, in unified diff notation."""
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    if not length:
+        return f'{start},0'
+    return f'{start + 1},{length}'
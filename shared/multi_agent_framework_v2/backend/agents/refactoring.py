@@ -1,13 +1,16 @@
 import ast
-import difflib
 import logging
+import re
 from typing import Any, Dict, List, Optional
 
 from backend.agents.base import BaseAgent
+from backend.agents.patching import EditedLines
 from backend.chat_memory import ChatMemory
 
 logger = logging.getLogger(__name__)
 
+_PERCENT_PLACEHOLDER_RE = re.compile(r'%[sdfr]')
+
 
 class RefactoringAgent(BaseAgent):
     """Agent that suggests code refactoring improvements."""
@@ -36,7 +39,7 @@ class RefactoringAgent(BaseAgent):
                     if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
                         if isinstance(node.left, ast.Str):
                             # Create a patch to replace %-formatting with f-strings
-                            new_lines = content_lines.copy()
+                            new_lines = EditedLines(content_lines)
                             start_line = node.lineno - 1
                             
                             # Get the original line and its indentation
@@ -53,17 +56,14 @@ class RefactoringAgent(BaseAgent):
                                 format_args = format_args[1:-1]
                             
                             # Replace %s, %d etc with {}
-                            import re
                             format_str = format_str.strip("'").strip('"')
-                            format_str = re.sub(r'%[sdfr]', '{}', format_str)
+                            format_str = _PERCENT_PLACEHOLDER_RE.sub('{}', format_str)
                             
                             new_line = f"{indentation}f'{format_str}'.format({format_args})\n"
                             new_lines[start_line] = new_line
                             
                             # Generate unified diff
-                            diff = difflib.unified_diff(
-                                content_lines,
-                                new_lines,
+                            diff = new_lines.unified_diff(
                                 fromfile=f"a/{file['path']}",
                                 tofile=f"b/{file['path']}",
                                 lineterm=''
@@ -81,7 +81,7 @@ class RefactoringAgent(BaseAgent):
                         for op in node.ops:
                             if isinstance(op, ast.Is) and isinstance(node.comparators[0], ast.Constant) and node.comparators[0].value is None:
                                 # Create a patch to fix None comparison
-                                new_lines = content_lines.copy()
+                                new_lines = EditedLines(content_lines)
                                 start_line = node.lineno - 1
                                 
                                 # Get the original line and its indentation
@@ -94,9 +94,7 @@ class RefactoringAgent(BaseAgent):
                                 new_lines[start_line] = new_line
                                 
                                 # Generate unified diff
-                                diff = difflib.unified_diff(
-                                    content_lines,
-                                    new_lines,
+                                diff = new_lines.unified_diff(
                                     fromfile=f"a/{file['path']}",
                                     tofile=f"b/{file['path']}",
                                     lineterm=''
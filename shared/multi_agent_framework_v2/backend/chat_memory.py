@@ -12,23 +12,24 @@ class ChatMemory:
 
     def infer_preferences(self, repo_path: str):
         """Infer coding style preferences from the repository (e.g., language, indentation style)."""
-        # Determine primary language by file extension frequency
-        ext_counts = {}
+        # Determine primary language by file extension frequency. A single walk
+        # records the paths per extension so the indentation pass below only
+        # has to open files of the main language instead of walking again.
+        files_by_ext = {}
         for root, dirs, files in os.walk(repo_path):
             for file in files:
                 ext = os.path.splitext(file)[1]
-                if not ext:
-                    continue
-                ext_counts[ext] = ext_counts.get(ext, 0) + 1
-        if ext_counts:
-            main_ext = max(ext_counts, key=ext_counts.get)
-            lang_map = {
-                '.py': 'Python',
-                '.js': 'JavaScript',
-                '.java': 'Java',
-                '.cpp': 'C++',
-                '.c': 'C'
-            }
+                files_by_ext.setdefault(ext, []).append(os.path.join(root, file))
+        lang_map = {
+            '.py': 'Python',
+            '.js': 'JavaScript',
+            '.java': 'Java',
+            '.cpp': 'C++',
+            '.c': 'C'
+        }
+        main_ext = max((ext for ext in files_by_ext if ext),
+                       key=lambda ext: len(files_by_ext[ext]), default=None)
+        if main_ext:
             language = lang_map.get(main_ext, main_ext.lstrip('.').capitalize())
         else:
             language = 'Unknown'
@@ -38,38 +39,30 @@ class ChatMemory:
         indent_style = 'spaces'
         tabs_found = False
         spaces_found = False
-        target_ext = None
-        if language != 'Unknown':
-            # invert lang_map for lookup
-            rev_map = {v: k for k, v in locals().get('lang_map', {}).items()}
-            target_ext = rev_map.get(language, None)
-        for root, dirs, files in os.walk(repo_path):
-            for file in files:
-                if target_ext:
-                    if not file.endswith(target_ext):
-                        continue
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r') as f:
-                        for line in f:
-                            if line.strip() == '':
-                                continue
-                            # Identify leading whitespace (tabs or spaces)
-                            indent = ''
-                            for ch in line:
-                                if ch == ' ' or ch == '\t':
-                                    indent += ch
-                                else:
-                                    break
-                            if '\t' in indent:
-                                tabs_found = True
-                            if indent.replace('\t', '') != '':
-                                # if indent (with tabs removed) still has spaces, then spaces were used
-                                spaces_found = True
-                            if tabs_found and spaces_found:
-                                break
-                except:
+        if main_ext in lang_map:
+            candidate_paths = files_by_ext[main_ext]
+        else:
+            candidate_paths = [path for paths in files_by_ext.values() for path in paths]
+        for file_path in candidate_paths:
+            # Only the head of each file is sampled; files with NUL bytes are binary
+            try:
+                with open(file_path, 'rb') as f:
+                    head = f.read(8192)
+            except OSError:
+                continue
+            if b'\x00' in head:
+                continue
+            for line in head.splitlines():
+                if not line.strip():
                     continue
+                # Identify leading whitespace (tabs or spaces)
+                indent = line[:len(line) - len(line.lstrip(b' \t'))]
+                if b'\t' in indent:
+                    tabs_found = True
+                if b' ' in indent:
+                    spaces_found = True
+                if tabs_found and spaces_found:
+                    break
             if tabs_found and spaces_found:
                 indent_style = 'mixed'
                 break
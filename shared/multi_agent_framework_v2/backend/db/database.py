@@ -1,10 +1,40 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Iterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from backend.db.models import Base
 
 DATABASE_URL = "sqlite:///backend/db/database.db"
-engine = create_engine(DATABASE_URL, future=True)
+# SQLite file databases otherwise get a NullPool, which opens a new
+# connection (and reruns the pragmas below) for every session. A pooled
+# connection only serves one session at a time, but that session may be
+# on another thread than the one that connected.
+engine = create_engine(
+    DATABASE_URL,
+    future=True,
+    poolclass=QueuePool,
+    pool_size=20,
+    max_overflow=10,
+    connect_args={"check_same_thread": False},
+)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    # WAL lets a review transaction commit with a single fsync and keeps readers unblocked
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 
+def get_db() -> Iterator[Session]:
+    """FastAPI dependency providing a session for one request, closed once the response is sent."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # If database is not migrated, you can create tables manually (for development):
 # Base.metadata.create_all(bind=engine)
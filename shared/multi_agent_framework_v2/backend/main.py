@@ -1,18 +1,24 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
 import os
-import tempfile
 from backend.agents.architecture_assistant import ArchitectureAssistant
 from backend.chat_memory import ChatMemory  # Add this import
-from backend.db.database import SessionLocal
+from backend.db.database import get_db
 from backend.db.models import ReviewSession, Suggestion
-from backend.orchestrator import AgentOrchestrator, apply_patch_to_file
-from backend.services.github import GitHubAPI
+from backend.orchestrator import AgentOrchestrator, apply_patch_to_content
+from backend.services.github import GitHubAPI, create_client_session
 from dotenv import load_dotenv
-from fastapi import (FastAPI, HTTPException, Query, WebSocket,
+from fastapi import (Depends, FastAPI, HTTPException, Query, WebSocket,
                      WebSocketDisconnect)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel as BaseModelV2
 from pydantic import ConfigDict
+from sqlalchemy.orm import Session
 
 load_dotenv()
 
@@ -22,19 +28,31 @@ import os
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+_RESPONSE_CLASS = ORJSONResponse if orjson is not None else JSONResponse
+
 # Pydantic v2 models
+# Responses are immutable once built; requests drop unknown fields instead of storing them
+_REQUEST_CONFIG = ConfigDict(extra='ignore')
+_RESPONSE_CONFIG = ConfigDict(frozen=True, extra='ignore', from_attributes=True)
+
 class GenerateRequest(BaseModelV2):
     prompt: str
+    model_config = _REQUEST_CONFIG
 
 class GenerateResponse(BaseModelV2):
     code: str
+    model_config = _RESPONSE_CONFIG
 
 class ReviewRequest(BaseModelV2):
     owner: str
     repo: str
     structure: Optional[Dict[str, Any]] = None
     github_token: str
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra='ignore')
 
 class ReviewSuggestion(BaseModelV2):
     id: int
@@ -43,50 +61,76 @@ class ReviewSuggestion(BaseModelV2):
     patch: Optional[str]
     file_path: Optional[str]
     status: str = 'pending'
+    model_config = _RESPONSE_CONFIG
 
 class ReviewResponse(BaseModelV2):
     session_id: int
     suggestions: List[ReviewSuggestion]
     files: List[Dict[str, Any]]  # Add files to response
+    model_config = _RESPONSE_CONFIG
+
+class ReviewTaskResponse(BaseModelV2):
+    task_id: str
+    status: str  # queued, running, completed or failed
+    result: Optional[ReviewResponse] = None
+    error: Optional[str] = None
+    model_config = _RESPONSE_CONFIG
 
 class ApplyPatchRequest(BaseModelV2):
     suggestion_id: int
     github_token: str
+    model_config = _REQUEST_CONFIG
 
 class ApplyPatchResponse(BaseModelV2):
     status: str
+    model_config = _RESPONSE_CONFIG
 
 class SummaryResponse(BaseModelV2):
     session_id: int
     summary: str
+    model_config = _RESPONSE_CONFIG
 
 class CreateBranchRequest(BaseModelV2):
     base_branch: str
     github_token: str
     suggestion_id: int
+    model_config = _REQUEST_CONFIG
 
 class CreateBranchResponse(BaseModelV2):
     branch_name: str
     status: str
+    model_config = _RESPONSE_CONFIG
 
 class CreatePRRequest(BaseModelV2):
     suggestion_id: int
+    model_config = _REQUEST_CONFIG
 
 class CreatePRResponse(BaseModelV2):
     pr_url: str
     status: str
+    model_config = _RESPONSE_CONFIG
 
 class ArchitectureAnalysisRequest(BaseModelV2):
     query: Optional[str] = None
     structure: Dict[str, Any]
     files: List[Dict[str, Any]]
+    model_config = _REQUEST_CONFIG
 
 class ArchitectureAnalysisResponse(BaseModelV2):
     suggestions: str
     type: str
     focus: str
+    model_config = _RESPONSE_CONFIG
 
-app = FastAPI(title="Code Review Assistant API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP session for all GitHub calls, so requests reuse open
+    # connections instead of each paying for a new TLS handshake
+    app.state.http = create_client_session()
+    yield
+    await app.state.http.close()
+
+app = FastAPI(title="Code Review Assistant API", lifespan=lifespan, default_response_class=_RESPONSE_CLASS)
 
 app.add_middleware(
     CORSMiddleware,
@@ -96,35 +140,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Suggestion patches and file listings compress well; small responses are
+# sent as-is since compressing them costs more than it saves
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Add WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.assistant = ArchitectureAssistant()
+        # Keyed by id(websocket) so connecting and disconnecting are O(1)
+        self.active_connections: Dict[int, WebSocket] = {}
+        self.chat_memories: Dict[int, ChatMemory] = {}  # One per connection, kept across its messages
+        self.assistants: Dict[int, ArchitectureAssistant] = {}  # Conversation state is never shared between connections
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections[id(websocket)] = websocket
+        self.chat_memories[id(websocket)] = ChatMemory()
+        self.assistants[id(websocket)] = ArchitectureAssistant()
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.pop(id(websocket), None)
+        self.chat_memories.pop(id(websocket), None)
+        self.assistants.pop(id(websocket), None)
 
     async def handle_message(self, websocket: WebSocket, data: Dict[str, Any]):
-        chat_memory = ChatMemory()
+        chat_memory = self.chat_memories[id(websocket)]
+        assistant = self.assistants[id(websocket)]
         if data.get('type') == 'init':
-            result = await self.assistant.analyze_structure(
+            result = await assistant.analyze_structure(
                 chat_memory=chat_memory,
                 structure=data.get('structure', {}),
                 files=data.get('files', [])
             )
         elif data.get('type') == 'query':
-            result = await self.assistant.analyze_structure(
+            result = await assistant.analyze_structure(
                 chat_memory=chat_memory,
-                structure=self.assistant.last_structure or {},
-                files=data.get('files', []),
+                structure=assistant.last_structure or {},
+                files=data.get('files') or assistant.last_files or [],
                 query=data.get('query')
             )
-        await websocket.send_json(result)
+        if orjson is not None:
+            await websocket.send_text(orjson.dumps(result).decode())
+        else:
+            await websocket.send_json(result)
 
 manager = ConnectionManager()
 
@@ -134,13 +192,15 @@ async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_json()
+            data = orjson.loads(await websocket.receive_text()) if orjson is not None else await websocket.receive_json()
             await manager.handle_message(websocket, data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
         await websocket.close()
+    finally:
+        manager.disconnect(websocket)
 
 @app.post("/generate", response_model=GenerateResponse)
 def generate_code(req: GenerateRequest):
@@ -149,62 +209,111 @@ def generate_code(req: GenerateRequest):
     code = orchestrator.generate_code(req.prompt)
     return GenerateResponse(code=code)
 
-@app.post("/review", response_model=ReviewResponse)
+async def _run_review(req: ReviewRequest) -> ReviewResponse:
+    """Review the requested repository and build the response."""
+    logger.debug(f"Starting review for {req.owner}/{req.repo}")
+
+    orchestrator = AgentOrchestrator()
+    session, suggestions = await orchestrator.run_review(
+        files=None,  # Will be fetched by orchestrator
+        structure=req.structure,  # Pass structure for agent use
+        github_info={
+            'owner': req.owner,
+            'repo': req.repo,
+            'token': req.github_token
+        },
+        repo_path=f"{req.owner}/{req.repo}",  # Provide repo_path
+        http_session=app.state.http
+    )
+
+    # The suggestions come straight from the rows the orchestrator inserted,
+    # so they are built without validation
+    formatted_suggestions = [ReviewSuggestion.model_construct(**s) for s in suggestions]
+
+    files = None  # Fetch files if needed
+
+    return ReviewResponse(
+        session_id=session.id,
+        suggestions=formatted_suggestions,
+        files=files if files else []  # Include files in response
+    )
+
+@app.post("/review", response_model=ReviewResponse, response_model_exclude_none=True)
 async def review_code(req: ReviewRequest) -> ReviewResponse:
     """Run code review on the repository."""
-    logger.debug(f"Starting review for {req.owner}/{req.repo}")
-    
     try:
-        orchestrator = AgentOrchestrator()
-        session, suggestions = await orchestrator.run_review(
-            files=None,  # Will be fetched by orchestrator
-            structure=req.structure,  # Pass structure for agent use
-            github_info={
-                'owner': req.owner,
-                'repo': req.repo,
-                'token': req.github_token
-            },
-            repo_path=f"{req.owner}/{req.repo}"  # Provide repo_path
-        )
-        
-        formatted_suggestions = [
-            ReviewSuggestion(
-                id=s.get('id', 0),
-                agent=s.get('agent', 'Unknown'),
-                message=s.get('message', ''),
-                patch=s.get('patch'),
-                file_path=s.get('file_path'),
-                status=s.get('status', 'pending')
-            ) for s in suggestions
-        ]
-        
-        files = None  # Fetch files if needed
-        
-        return ReviewResponse(
-            session_id=session.id,
-            suggestions=formatted_suggestions,
-            files=files if files else []  # Include files in response
-        )
-        
+        return await _run_review(req)
     except Exception as e:
         logger.error(f"Error during review: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Reviews queued through /review/tasks, oldest first; finished ones are
+# dropped once there are more than _REVIEW_TASK_LIMIT
+_REVIEW_TASK_LIMIT = 100
+_review_tasks: 'OrderedDict[str, ReviewTaskResponse]' = OrderedDict()
+_running_reviews: set = set()  # Keeps a reference to each task until it finishes
+
+async def _review_task(task_id: str, req: ReviewRequest):
+    _review_tasks[task_id] = ReviewTaskResponse(task_id=task_id, status="running")
+    try:
+        result = await _run_review(req)
+    except Exception as e:
+        logger.error(f"Error during review task {task_id}: {str(e)}", exc_info=True)
+        _review_tasks[task_id] = ReviewTaskResponse(task_id=task_id, status="failed", error=str(e))
+    else:
+        _review_tasks[task_id] = ReviewTaskResponse(task_id=task_id, status="completed", result=result)
+
+@app.post("/review/tasks", response_model=ReviewTaskResponse, status_code=202)
+async def submit_review(req: ReviewRequest) -> ReviewTaskResponse:
+    """Queue a code review and return its task id to poll for the result."""
+    task_id = uuid.uuid4().hex
+    queued = ReviewTaskResponse(task_id=task_id, status="queued")
+    _review_tasks[task_id] = queued
+
+    finished = [key for key, task in _review_tasks.items() if task.status in ("completed", "failed")]
+    for key in finished[:max(0, len(_review_tasks) - _REVIEW_TASK_LIMIT)]:
+        del _review_tasks[key]
+
+    task = asyncio.create_task(_review_task(task_id, req))
+    _running_reviews.add(task)
+    task.add_done_callback(_running_reviews.discard)
+    return queued
+
+@app.get("/review/tasks/{task_id}", response_model=ReviewTaskResponse)
+async def get_review_task(task_id: str) -> ReviewTaskResponse:
+    """Get the status of a queued review, with its result once completed."""
+    task = _review_tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Review task not found")
+    return task
+
+def _get_suggestion_and_session(db: Session, suggestion_id: int) -> Tuple[Suggestion, Optional[ReviewSession]]:
+    """
+    Load a suggestion and its review session in one query; the session is None
+    if it no longer exists. Raises a 404 if there is no such suggestion.
+    """
+    row = (
+        db.query(Suggestion, ReviewSession)
+        .outerjoin(ReviewSession, Suggestion.session_id == ReviewSession.id)
+        .filter(Suggestion.id == suggestion_id)
+        .one_or_none()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Suggestion not found")
+    return row
+
 @app.post("/apply-patch", response_model=ApplyPatchResponse)
-async def apply_patch(req: ApplyPatchRequest):
+async def apply_patch(req: ApplyPatchRequest, db: Session = Depends(get_db)):
     """Apply the code patch for the given suggestion ID."""
-    db = SessionLocal()
+    github = None
     try:
         # Get the suggestion and its session
-        suggestion = db.query(Suggestion).get(req.suggestion_id)
-        if not suggestion:
-            raise HTTPException(status_code=404, detail="Suggestion not found")
+        suggestion, session = _get_suggestion_and_session(db, req.suggestion_id)
         if not suggestion.patch:
             raise HTTPException(status_code=400, detail="No patch available for this suggestion")
         if suggestion.status == "applied":
             return ApplyPatchResponse(status="already applied")
 
-        session = db.query(ReviewSession).get(suggestion.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Review session not found")
 
@@ -215,61 +324,17 @@ async def apply_patch(req: ApplyPatchRequest):
             raise HTTPException(status_code=400, detail="Invalid repository path format")
 
         # Create GitHub API client
-        github = GitHubAPI(req.github_token)
+        github = GitHubAPI(req.github_token, app.state.http)
 
         # Get the file content
         file_content = await github.get_file_content(owner, repo, suggestion.file_path)
         if not file_content:
             raise HTTPException(status_code=404, detail=f"File {suggestion.file_path} not found")
 
-        # Apply the patch using a temporary file
-        # Create temporary files for the patch process
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as original_file, \
-             tempfile.NamedTemporaryFile(mode='w', delete=False) as patch_file:
-            
-            # Write original content
-            original_file.write(file_content)
-            original_file.flush()
-            original_file_path = original_file.name
-            
-            # Write patch content
-            patch_file.write(suggestion.patch)
-            patch_file.flush()
-            patch_file_path = patch_file.name
-        
-        try:
-            # Apply patch using our custom function instead of subprocess
-            with open(original_file_path, 'r') as f:
-                original_content = f.read()
-                
-            # Apply the patch to the content
-            from backend.orchestrator import apply_patch_to_file
-            
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Create a temporary file structure similar to the repo
-                os.makedirs(os.path.dirname(os.path.join(temp_dir, suggestion.file_path)), exist_ok=True)
-                with open(os.path.join(temp_dir, suggestion.file_path), 'w') as f:
-                    f.write(original_content)
-                
-                # Apply the patch
-                success = apply_patch_to_file(suggestion.patch, temp_dir)
-                if not success:
-                    raise HTTPException(status_code=500, detail="Failed to apply patch")
-                
-                # Read the patched content
-                with open(os.path.join(temp_dir, suggestion.file_path), 'r') as f:
-                    patched_content = f.read()
-        
-        except Exception as e:
-            logger.error(f"Failed to apply patch: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Failed to apply patch: {str(e)}")
-        finally:
-            # Clean up temp files
-            try:
-                os.unlink(original_file_path)
-                os.unlink(patch_file_path)
-            except Exception as e:
-                logger.warning(f"Error cleaning up temp files: {str(e)}")
+        # Apply the patch to the content in memory
+        patched_content = apply_patch_to_content(suggestion.patch, file_content)
+        if patched_content is None:
+            raise HTTPException(status_code=500, detail="Failed to apply patch")
 
         # Create a commit with the changes
         try:
@@ -294,36 +359,33 @@ async def apply_patch(req: ApplyPatchRequest):
         logger.error(f"Error applying patch: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        db.close()
+        if github is not None:
+            await github.close()
 
 @app.get("/summary", response_model=SummaryResponse)
-def get_summary(session_id: Optional[int] = Query(None)):
+def get_summary(session_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
     """Get the summary of suggestions for a review session."""
-    db = SessionLocal()
-    try:
-        if session_id is None:
-            session_obj = db.query(ReviewSession).order_by(ReviewSession.id.desc()).first()
-            if not session_obj:
-                raise HTTPException(status_code=404, detail="No review sessions found")
-        else:
-            session_obj = db.query(ReviewSession).get(session_id)
-            if not session_obj:
-                raise HTTPException(status_code=404, detail="Review session not found")
-        return SummaryResponse(session_id=session_obj.id, summary=session_obj.summary or "")
-    finally:
-        db.close()
+    if session_id is None:
+        session_obj = db.query(ReviewSession).order_by(ReviewSession.id.desc()).first()
+        if not session_obj:
+            raise HTTPException(status_code=404, detail="No review sessions found")
+    else:
+        session_obj = db.query(ReviewSession).get(session_id)
+        if not session_obj:
+            raise HTTPException(status_code=404, detail="Review session not found")
+    return SummaryResponse(session_id=session_obj.id, summary=session_obj.summary or "")
+
+def _branch_name(suggestion: Suggestion) -> str:
+    """Name of the branch holding a suggestion's fix, shared by create-branch and create-pr."""
+    return f"fix/{suggestion.agent.lower()}-{suggestion.id}"
 
 @app.post("/github/create-branch", response_model=CreateBranchResponse)
-async def create_branch(req: CreateBranchRequest):
+async def create_branch(req: CreateBranchRequest, db: Session = Depends(get_db)):
     """Create a new branch for a suggestion."""
-    db = SessionLocal()
+    github = None
     try:
         # Get the suggestion and its session
-        suggestion = db.query(Suggestion).get(req.suggestion_id)
-        if not suggestion:
-            raise HTTPException(status_code=404, detail="Suggestion not found")
-        
-        session = db.query(ReviewSession).get(suggestion.session_id)
+        suggestion, session = _get_suggestion_and_session(db, req.suggestion_id)
         if not session:
             raise HTTPException(status_code=404, detail="Review session not found")
         
@@ -339,10 +401,10 @@ async def create_branch(req: CreateBranchRequest):
             raise HTTPException(status_code=401, detail="GitHub token not found")
         
         # Create GitHub API client
-        github = GitHubAPI(github_token)
+        github = GitHubAPI(github_token, app.state.http)
         
         # Generate a unique branch name
-        branch_name = f"fix/{suggestion.agent.lower()}-{suggestion.id}"
+        branch_name = _branch_name(suggestion)
         
         # Create branch
         success = await github.create_branch(
@@ -364,19 +426,16 @@ async def create_branch(req: CreateBranchRequest):
         logger.error(f"Error creating branch: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        db.close()
+        if github is not None:
+            await github.close()
 
 @app.post("/github/create-pr", response_model=CreatePRResponse)
-async def create_pr(req: CreatePRRequest):
+async def create_pr(req: CreatePRRequest, db: Session = Depends(get_db)):
     """Create a pull request for a suggestion."""
-    db = SessionLocal()
+    github = None
     try:
         # Get the suggestion and its session
-        suggestion = db.query(Suggestion).get(req.suggestion_id)
-        if not suggestion:
-            raise HTTPException(status_code=404, detail="Suggestion not found")
-        
-        session = db.query(ReviewSession).get(suggestion.session_id)
+        suggestion, session = _get_suggestion_and_session(db, req.suggestion_id)
         if not session:
             raise HTTPException(status_code=404, detail="Review session not found")
         
@@ -392,10 +451,10 @@ async def create_pr(req: CreatePRRequest):
             raise HTTPException(status_code=401, detail="GitHub token not found")
         
         # Create GitHub API client
-        github = GitHubAPI(github_token)
+        github = GitHubAPI(github_token, app.state.http)
         
-        # Generate branch name (should match the one created earlier)
-        branch_name = f"fix/{suggestion.agent.lower()}-{suggestion.id}"
+        # Same branch name create_branch used
+        branch_name = _branch_name(suggestion)
         
         # Create PR
         pr_url = await github.create_pull_request(
@@ -419,7 +478,8 @@ async def create_pr(req: CreatePRRequest):
         logger.error(f"Error creating PR: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        db.close()
+        if github is not None:
+            await github.close()
 
 @app.post("/architecture/analyze", response_model=ArchitectureAnalysisResponse)
 async def analyze_architecture(req: ArchitectureAnalysisRequest):
@@ -1,11 +1,16 @@
 import asyncio
-import difflib
+import hashlib
+import json
 import logging
 import os
 import re
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache, partial
 from typing import Any, Dict, List, Optional, Tuple
 
+from aiohttp import ClientSession
+from sqlalchemy import insert, update
+
 from backend.agents.coder import CoderAgent
 from backend.agents.dependency import DependencyAgent
 from backend.agents.linting import LintingAgent
@@ -19,6 +24,85 @@ from backend.services.github import GitHubAPI
 
 logger = logging.getLogger(__name__)
 
+_HUNK_RE = re.compile(rb'^@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+
+# Rows per multi-row INSERT; six columns each keeps a statement under
+# SQLite's historical limit of 999 bound parameters
+_INSERT_BATCH_ROWS = 150
+
+# Review agents are deterministic in their inputs, so results are cached
+# per agent and file set; re-reviewing unchanged files skips the agent run
+_AGENT_CACHE_SIZE = 256
+_agent_cache: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+
+# Seconds an agent may run before its results are dropped from the review;
+# a sync agent's worker thread cannot be interrupted and finishes on its own
+_AGENT_TIMEOUT_S = 120
+
+# Summaries still being generated; holds a reference to each task until it
+# finishes so it is not garbage collected mid-run
+_summary_tasks: set = set()
+
+def _review_inputs_digest(
+    files: Optional[List[Dict[str, Any]]],
+    structure: Optional[Dict[str, Any]],
+) -> Optional[str]:
+    """Hash the files and structure a review runs on, or None when there are no files to key on."""
+    if files is None:
+        return None
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.get('path', '')).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(str(file.get('content', '')).encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(json.dumps(structure, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def _dependency_tiers(agents: List[Any]) -> List[List[Any]]:
+    """
+    Group agents into tiers by their depends_on declarations. Every agent
+    lands in a later tier than the agents it depends on; dependencies on
+    agents that are not configured are ignored.
+    """
+    by_name = {agent.__class__.__name__: agent for agent in agents}
+    tier_of: Dict[str, int] = {}
+
+    def tier(agent: Any, visiting: Tuple[str, ...] = ()) -> int:
+        name = agent.__class__.__name__
+        if name not in tier_of:
+            if name in visiting:
+                raise ValueError(f"Circular agent dependency involving {name}")
+            deps = [by_name[dep] for dep in getattr(agent, 'depends_on', ()) if dep in by_name]
+            tier_of[name] = 1 + max((tier(dep, visiting + (name,)) for dep in deps), default=-1)
+        return tier_of[name]
+
+    tiers: List[List[Any]] = []
+    for agent in agents:
+        index = tier(agent)
+        while len(tiers) <= index:
+            tiers.append([])
+        tiers[index].append(agent)
+    return tiers
+
+def _summarize_suggestion(suggestion: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Condense a suggestion for the meta review; full patches are replaced by
+    their size. The message is kept whole, since the summary matches keywords
+    anywhere in it.
+    """
+    return {
+        'agent': suggestion['agent'],
+        'file_path': suggestion.get('file_path'),
+        'message': suggestion['message'],
+        'patch_lines': (suggestion.get('patch') or '').count('\n'),
+    }
+
+@lru_cache(maxsize=1)
+def _coder_agent() -> CoderAgent:
+    """Shared CoderAgent, built on first use and reused for every prompt."""
+    return CoderAgent()
+
 class AgentOrchestrator:
     def __init__(self):
         self.chat_memory = ChatMemory()
@@ -28,12 +112,15 @@ class AgentOrchestrator:
             DependencyAgent(),
             LLMReviewAgent()
         ]
+        # Kept apart from the review agents; its run takes their suggestions
+        # rather than the files
+        self.meta_agent = MetaReviewAgent()
         self.agent_stats = {}
         logger.info(f"Initialized {len(self.agents)} agents")
 
     def generate_code(self, prompt: str) -> str:
         """Generate code from a prompt using the CoderAgent."""
-        return CoderAgent().run(prompt, self.chat_memory)
+        return _coder_agent().run(prompt, self.chat_memory)
 
     async def run_review(
         self,
@@ -41,108 +128,273 @@ class AgentOrchestrator:
         structure: Optional[Dict[str, Any]] = None,
         github_info: Optional[Dict[str, str]] = None,
         repo_path: Optional[str] = None,
+        http_session: Optional[ClientSession] = None,
     ) -> Tuple[ReviewSession, List[Dict[str, Any]]]:
-        """Run code review using all agents."""
-        logger.info(f"Initialized {len(self.agents)} agents")
-        
-        db = SessionLocal()
-        try:
-            # If github_info is provided, use it to construct repo_path
-            session_repo_path = repo_path
-            if github_info:
-                session_repo_path = f"{github_info['owner']}/{github_info['repo']}"
-            
-            session = ReviewSession(
-                repo_path=session_repo_path,
-                summary=""  # Initialize with empty summary
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-            
-            # If files not provided but github_info is, fetch files from GitHub
-            if not files and github_info:
-                github = GitHubAPI(github_info['token'])
+        """
+        Run code review using all agents. A long-lived process passes its
+        shared http_session so GitHub connections outlive a single review.
+        """
+
+        # If github_info is provided, use it to construct repo_path
+        session_repo_path = repo_path
+        if github_info:
+            session_repo_path = f"{github_info['owner']}/{github_info['repo']}"
+
+        # If files not provided but github_info is, fetch files from GitHub
+        if not files and github_info:
+            async with GitHubAPI(github_info['token'], http_session) as github:
                 files = await github.analyze_repository(
                     github_info['owner'],
                     github_info['repo']
                 )
-            
-            all_suggestions = []
-            
-            # Run agents in parallel when possible
-            async def run_agent(agent):
-                agent_name = agent.__class__.__name__
-                logger.info(f"Running {agent_name}")
-                try:
-                    if asyncio.iscoroutinefunction(agent.run):
-                        suggestions = await agent.run(
+
+        inputs_digest = _review_inputs_digest(files, structure)
+
+        # Run agents in parallel when possible
+        async def run_agent(agent):
+            agent_name = agent.__class__.__name__
+            cache_key = f"agent:{agent_name}:files:{inputs_digest}" if inputs_digest else None
+            if cache_key in _agent_cache:
+                _agent_cache.move_to_end(cache_key)
+                logger.info(f"Reusing cached results for {agent_name}")
+                return agent_name, [dict(s) for s in _agent_cache[cache_key]]
+
+            logger.info(f"Running {agent_name}")
+            try:
+                if asyncio.iscoroutinefunction(agent.run):
+                    pending = agent.run(
+                        self.chat_memory,
+                        structure=structure,
+                        files=files,
+                        github_info=github_info,
+                        repo_path=repo_path
+                    )
+                else:
+                    # Run CPU-bound agents in the event loop's shared thread
+                    # pool rather than in a pool built and torn down per call
+                    pending = asyncio.get_running_loop().run_in_executor(
+                        None,
+                        partial(
+                            agent.run,
                             self.chat_memory,
                             structure=structure,
                             files=files,
                             github_info=github_info,
                             repo_path=repo_path
                         )
-                    else:
-                        # Run CPU-bound agents in a thread pool
-                        with ThreadPoolExecutor() as executor:
-                            suggestions = await asyncio.get_event_loop().run_in_executor(
-                                executor,
-                                agent.run,
-                                self.chat_memory,
-                                structure,
-                                files,
-                                github_info,
-                                repo_path
-                            )
-                    
-                    return agent_name, suggestions
-                except Exception as e:
-                    logger.error(f"Error running {agent_name}: {str(e)}", exc_info=True)
-                    return agent_name, []
-
-            # Run all agents concurrently
-            agent_results = await asyncio.gather(*[run_agent(agent) for agent in self.agents])
-            
-            # Process results and store in database
-            for agent_name, suggestions in agent_results:
-                for suggestion in suggestions:
-                    db_suggestion = Suggestion(
-                        session_id=session.id,
-                        agent=agent_name,
-                        message=suggestion.get('message', ''),
-                        patch=suggestion.get('patch'),
-                        file_path=suggestion.get('file_path'),
-                        status='pending'
                     )
-                    db.add(db_suggestion)
-                    db.commit()
-                    db.refresh(db_suggestion)
-                    
-                    all_suggestions.append({
-                        'id': db_suggestion.id,
-                        'agent': agent_name,
-                        'message': suggestion.get('message', ''),
-                        'patch': suggestion.get('patch'),
-                        'file_path': suggestion.get('file_path'),
-                        'status': 'pending'
-                    })
-
-            # Generate summary using MetaReviewAgent
-            meta_agent = next((a for a in self.agents if isinstance(a, MetaReviewAgent)), None)
-            if meta_agent:
-                try:
-                    summary = meta_agent.run(all_suggestions, self.chat_memory)
-                    session.summary = summary
-                    db.commit()
-                except Exception as e:
-                    logger.error(f"Error generating summary: {str(e)}", exc_info=True)
-            
-            logger.info(f"Review completed. Found {len(all_suggestions)} total suggestions.")
-            return session, all_suggestions
-            
-        finally:
-            db.close()
+                # A hung agent must not stall the rest of the review
+                suggestions = await asyncio.wait_for(pending, timeout=_AGENT_TIMEOUT_S)
+
+                if cache_key:
+                    _agent_cache[cache_key] = [dict(s) for s in suggestions]
+                    while len(_agent_cache) > _AGENT_CACHE_SIZE:
+                        _agent_cache.popitem(last=False)
+                return agent_name, suggestions
+            except asyncio.TimeoutError:
+                logger.error(f"{agent_name} timed out after {_AGENT_TIMEOUT_S}s")
+                return agent_name, []
+            except Exception as e:
+                logger.error(f"Error running {agent_name}: {str(e)}", exc_info=True)
+                return agent_name, []
+
+        # Run each tier of independent agents concurrently, waiting for a
+        # tier to finish before starting the agents that depend on it
+        agent_results = []
+        for tier in _dependency_tiers(self.agents):
+            agent_results.extend(await asyncio.gather(*[run_agent(agent) for agent in tier]))
+
+        # Store the session and all of its suggestions in a single transaction,
+        # committed when the block exits and rolled back on any error
+        with SessionLocal() as db, db.begin():
+            session = ReviewSession(
+                repo_path=session_repo_path,
+                summary=""  # Initialize with empty summary
+            )
+            db.add(session)
+            db.flush()  # Populates session.id
+
+            # Insert the suggestions with multi-row Core INSERTs rather than
+            # one ORM INSERT per row
+            rows = [
+                {
+                    'session_id': session.id,
+                    'agent': agent_name,
+                    'message': suggestion.get('message', ''),
+                    'patch': suggestion.get('patch'),
+                    'file_path': suggestion.get('file_path'),
+                    'status': 'pending'
+                }
+                for agent_name, suggestions in agent_results
+                for suggestion in suggestions
+            ]
+            for start in range(0, len(rows), _INSERT_BATCH_ROWS):
+                batch = rows[start:start + _INSERT_BATCH_ROWS]
+                result = db.execute(insert(Suggestion.__table__).values(batch))
+                # SQLite numbers the rows of a single INSERT consecutively up
+                # to lastrowid while this transaction holds the write lock
+                first_id = result.lastrowid - len(batch) + 1
+                for offset, row in enumerate(batch):
+                    row['id'] = first_id + offset
+
+            all_suggestions = [
+                {
+                    'id': row['id'],
+                    'agent': row['agent'],
+                    'message': row['message'],
+                    'patch': row['patch'],
+                    'file_path': row['file_path'],
+                    'status': row['status']
+                }
+                for row in rows
+            ]
+
+        # Generate the summary with MetaReviewAgent in the background, so the
+        # suggestions are returned without waiting on it; clients poll
+        # /summary, which is empty until it is stored
+        task = asyncio.create_task(self._store_summary(session.id, all_suggestions))
+        _summary_tasks.add(task)
+        task.add_done_callback(_summary_tasks.discard)
+
+        logger.info(f"Review completed. Found {len(all_suggestions)} total suggestions.")
+        return session, all_suggestions
+
+    async def _store_summary(self, session_id: int, suggestions: List[Dict[str, Any]]) -> None:
+        """Summarize the session's suggestions and store the summary in a transaction of its own."""
+        try:
+            summary = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.meta_agent.run,
+                [_summarize_suggestion(s) for s in suggestions],
+                self.chat_memory
+            )
+            with SessionLocal() as db, db.begin():
+                db.execute(
+                    update(ReviewSession)
+                    .where(ReviewSession.id == session_id)
+                    .values(summary=summary)
+                )
+        except Exception as e:
+            logger.error(f"Error generating summary: {str(e)}", exc_info=True)
+
+def _apply_with_libgit2(patch: str, repo_path: str, target_file: str) -> bool:
+    """
+    Apply the patch to a git work tree with libgit2, when pygit2 is installed.
+    Returns False if pygit2 is missing, repo_path is not the root of a work
+    tree, or libgit2 rejects the patch; libgit2 writes nothing in that case.
+    """
+    try:
+        import pygit2
+    except ImportError:
+        return False
+
+    # libgit2 only parses git-style patches, while the agents emit plain
+    # difflib output without the 'diff --git' line
+    if not patch.startswith('diff --git '):
+        patch = f"diff --git a/{target_file} b/{target_file}\n{patch}"
+    if not patch.endswith('\n'):
+        patch += '\n'
+
+    try:
+        repo = pygit2.Repository(repo_path)
+        if not repo.workdir or os.path.realpath(repo.workdir) != os.path.realpath(repo_path):
+            return False
+        diff = pygit2.Diff.parse_diff(patch)
+        repo.apply(diff, pygit2.GIT_APPLY_LOCATION_WORKDIR)
+    except Exception as e:
+        logging.debug("libgit2 could not apply patch, using the built-in applier: %s", e)
+        return False
+
+    logging.debug("Patch applied with libgit2.")
+    return True
+
+def _apply_hunks(lines: List[bytes], original_lines: List[bytes]) -> List[bytes]:
+    """
+    Apply the hunks in the patch lines to the original file lines and return
+    the patched lines. Kept free of I/O and fully typed so the hot loop can
+    be compiled ahead of time (e.g. with mypyc) without changes.
+    """
+    # Lines taken from the patch use the file's own line ending
+    eol = b'\r\n' if original_lines and original_lines[0].endswith(b'\r\n') else b'\n'
+    new_lines: List[bytes] = []
+    pointer = 0
+
+    # Most LLM patches rewrite the whole file: one hunk from the first line
+    # that removes every original line, then adds the new ones. The result
+    # is just the added lines, so that shape skips the general walk; any
+    # further hunk header would show up among the lines checked for '+'
+    m = _HUNK_RE.match(lines[0]) if lines else None
+    if m and int(m.group(1)) <= 1:
+        removed = next((idx for idx, line in enumerate(lines[1:]) if line[:1] != b'-'), len(lines) - 1)
+        if removed == len(original_lines):
+            added = [line[1:] + eol for line in lines[removed + 1:] if line[:1] == b'+']
+            if len(added) == len(lines) - 1 - removed:
+                return added
+
+    # Locate every hunk header in one pass; each hunk body is the slice up
+    # to the next header (or the end of the patch)
+    hunk_starts = [idx for idx, line in enumerate(lines) if line[:2] == b'@@']
+    hunk_bounds = zip(hunk_starts, hunk_starts[1:] + [len(lines)])
+
+    for start, end in hunk_bounds:
+        header = lines[start]
+        m = _HUNK_RE.match(header)
+        orig_start = int(m.group(1)) if m else 1
+        logging.debug("Found hunk header: %s -> original_start=%d", header, orig_start)
+
+        orig_index = orig_start - 1
+        if pointer < orig_index:
+            logging.debug("Copying unchanged lines from pointer=%d to orig_index=%d", pointer, orig_index)
+            new_lines.extend(original_lines[pointer:orig_index])
+            pointer = orig_index
+
+        # Context and added lines are emitted; context and removed lines
+        # consume the original file
+        body = lines[start + 1:end]
+        new_lines.extend([line[1:] + eol for line in body if line[:1] in (b' ', b'+')])
+        pointer += sum(1 for line in body if line[:1] in (b' ', b'-'))
+
+    if pointer < len(original_lines):
+        logging.debug("Copying remaining lines from pointer=%d to end (total %d).",
+                      pointer, len(original_lines))
+        new_lines.extend(original_lines[pointer:])
+
+    return new_lines
+
+def _split_patch(patch: str) -> Optional[Tuple[str, List[bytes]]]:
+    """
+    Split a unified diff into the target file named by its '+++ ' header and
+    the patch lines after that header, as bytes; None if there is no header.
+    """
+    # The '+++ ' header sits near the top of a unified diff, so locate it
+    # directly instead of scanning every patch line for it
+    if patch.startswith('+++ '):
+        header_start = 0
+    else:
+        header_start = patch.find('\n+++ ') + 1
+        if not header_start:
+            return None
+    header_end = patch.find('\n', header_start)
+    if header_end < 0:
+        header_end = len(patch)
+    header = patch[header_start:header_end].rstrip('\r')
+    target_file = header[6:] if header.startswith('+++ b/') else header[4:]
+
+    # Hunks follow the header; only that remainder needs splitting
+    return target_file, patch[header_end + 1:].encode('utf-8').splitlines()
+
+def apply_patch_to_content(patch: str, original: str) -> Optional[str]:
+    """
+    Apply a unified diff patch string to a file's content held in memory.
+    Returns the patched content, or None if the patch has no target header.
+    """
+    split = _split_patch(patch) if patch else None
+    if split is None:
+        return None
+    _, lines = split
+    # Split like the agents did when numbering the lines of the patch
+    original_lines = [line.encode('utf-8') for line in original.splitlines(keepends=True)]
+    return b''.join(_apply_hunks(lines, original_lines)).decode('utf-8')
 
 def apply_patch_to_file(patch: str, repo_path: str) -> bool:
     """
@@ -155,30 +407,29 @@ def apply_patch_to_file(patch: str, repo_path: str) -> bool:
     logging.debug("Repo path: %s", repo_path)
     logging.debug("Patch:\n%s", patch)
 
-    lines = patch.splitlines()
-    if not lines:
+    if not patch:
         logging.debug("Patch is empty.")
         return False
 
-    target_file = None
-    for line in lines:
-        if line.startswith('+++ '):
-            if line.startswith('+++ b/'):
-                target_file = line[6:]
-            else:
-                target_file = line[4:]
-            logging.debug("Discovered target file from diff: %s", target_file)
-            break
-
-    if target_file is None:
+    split = _split_patch(patch)
+    if split is None:
         logging.debug("Could not parse target file from patch. No '+++ ' line found.")
         return False
+    target_file, lines = split
+    logging.debug("Discovered target file from diff: %s", target_file)
 
+    # Prefer libgit2's C implementation inside a git work tree; the
+    # line-based applier below handles everything else
+    if _apply_with_libgit2(patch, repo_path, target_file):
+        return True
+
+    # The file is patched as bytes so lines are never decoded or re-encoded
+    # one by one
     file_path = os.path.join(repo_path, target_file)
     logging.debug("Full file path to patch: %s", file_path)
 
     try:
-        with open(file_path, 'r') as f:
+        with open(file_path, 'rb') as f:
             original_lines = f.readlines()
         logging.debug("Successfully read original file: %d lines", len(original_lines))
     except FileNotFoundError:
@@ -188,53 +439,11 @@ def apply_patch_to_file(patch: str, repo_path: str) -> bool:
         logging.debug("Exception reading file %s: %s", file_path, e)
         return False
 
-    new_lines = []
-    pointer = 0
-    i = 0
-
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith('--- ') or line.startswith('+++ '):
-            i += 1
-            continue
-
-        if line.startswith('@@'):
-            import re
-            m = re.match(r'^@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@', line)
-            if m:
-                orig_start = int(m.group(1))
-            else:
-                orig_start = 1
-            logging.debug("Found hunk header: %s -> original_start=%d", line, orig_start)
-
-            orig_index = orig_start - 1
-            if pointer < orig_index:
-                logging.debug("Copying unchanged lines from pointer=%d to orig_index=%d", pointer, orig_index)
-                new_lines.extend(original_lines[pointer:orig_index])
-                pointer = orig_index
-
-            i += 1
-            while i < len(lines) and not lines[i].startswith('@@'):
-                hunk_line = lines[i]
-                if hunk_line.startswith(' '):
-                    new_lines.append(hunk_line[1:] + "\n")
-                    pointer += 1
-                elif hunk_line.startswith('-'):
-                    pointer += 1
-                elif hunk_line.startswith('+'):
-                    new_lines.append(hunk_line[1:] + "\n")
-                i += 1
-        else:
-            i += 1
-
-    if pointer < len(original_lines):
-        logging.debug("Copying remaining lines from pointer=%d to end (total %d).",
-                      pointer, len(original_lines))
-        new_lines.extend(original_lines[pointer:])
+    new_lines = _apply_hunks(lines, original_lines)
 
     try:
-        with open(file_path, 'w') as f:
-            f.writelines(new_lines)
+        with open(file_path, 'wb') as f:
+            f.write(b''.join(new_lines))
         logging.debug("Successfully wrote %d lines to %s", len(new_lines), file_path)
     except Exception as e:
         logging.debug("Exception writing patched file: %s", e)
@@ -1,152 +1,491 @@
 import asyncio
-import base64
+import hashlib
+import json
 import logging
+import math
+import os
+import random
 import time
+from collections import OrderedDict
 from functools import lru_cache
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout, TCPConnector
 
 logger = logging.getLogger(__name__)
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+# File extensions analyze_repository fetches for review
+SOURCE_EXTENSIONS = frozenset({'.py', '.js', '.ts', '.tsx', '.jsx'})
+# The same as suffixes, and their last characters; checking the last
+# character first rejects most other files without any string scan
+_SOURCE_SUFFIXES = tuple(SOURCE_EXTENSIONS)
+_SOURCE_LAST_CHARS = frozenset(ext[-1] for ext in SOURCE_EXTENSIONS)
+
+# Media type that makes GitHub send file bodies as-is rather than base64 in JSON
+RAW_MEDIA_TYPE = 'application/vnd.github.raw'
+
+# Base64 bodies longer than this are decoded off the event loop
+BASE64_THREAD_THRESHOLD = 64 * 1024
+
+# Seconds cached lookups stay fresh; blobs are immutable and never expire
+DEFAULT_BRANCH_TTL = 300
+REF_SHA_TTL = 60
+CONTENTS_TTL = 60
+
+# Total body bytes of the responses kept for ETag revalidation, shared by
+# all clients; blobs are immutable and cached on disk, so they are not kept
+ETAG_CACHE_BYTES = 64 * 1024 * 1024
+
+# Below this many remaining requests, calls are spread out until the rate limit resets
+RATE_LIMIT_LOW_WATER = 100
+
+# Responses and errors worth retrying; anything else fails without a backoff
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+_RETRYABLE_ERRORS = (ClientConnectionError, asyncio.TimeoutError)
+
+# Blob contents are also kept on disk across restarts when diskcache is installed
+BLOB_CACHE_DIR = os.environ.get('CODEWEAVER_CACHE_DIR', os.path.expanduser('~/.cache/codeweaver/gh'))
+BLOB_CACHE_SIZE = 500 * 1024 * 1024
+
+# Workers analyze_repository runs to download blobs while the tree is still being listed
+BLOB_WORKERS = 16
+
+# Files with a NUL byte this close to their start are binary and skipped
+BINARY_SNIFF_BYTES = 1024
+
+# Blobs fetched together in one GraphQL request, up to this many or until
+# their combined size passes the byte limit
+GRAPHQL_BATCH_SIZE = 100
+GRAPHQL_BATCH_BYTES = 2 * 1024 * 1024
+
+@lru_cache(maxsize=None)
+def _blob_disk_cache():
+    """Open the on-disk blob cache, or return None if diskcache is unavailable."""
+    try:
+        import diskcache
+    except ImportError:
+        return None
+    try:
+        return diskcache.Cache(BLOB_CACHE_DIR, size_limit=BLOB_CACHE_SIZE)
+    except OSError as e:
+        logger.warning(f"Could not open blob cache at {BLOB_CACHE_DIR}: {e}")
+        return None
+
+def create_client_session() -> ClientSession:
+    """
+    A pooled aiohttp session for GitHub requests. Authentication is sent per
+    request, so one session can serve clients with different tokens.
+    """
+    timeout = ClientTimeout(total=30)
+    # aiohttp already sets TCP_NODELAY on every connection it opens, so small
+    # API calls on a kept-alive connection are not held back by Nagle's
+    # algorithm. The limit stays above the 20 requests each client allows,
+    # since the session is shared between clients
+    connector = TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+    return ClientSession(timeout=timeout, connector=connector)
+
 class GitHubAPI:
-    def __init__(self, access_token: str = None):
-        """Initialize with optional access token from user session."""
+    # Shared across instances, since each review and endpoint call makes its
+    # own client; later ones revalidate what earlier ones downloaded
+    _etags: 'OrderedDict[tuple, tuple]' = OrderedDict()  # (token digest, url, params, accept) -> (etag, body, size)
+    _etag_bytes = 0  # Sum of the sizes in _etags
+
+    def __init__(self, access_token: str = None, session: Optional[ClientSession] = None):
+        """
+        Initialize with optional access token from user session. A shared
+        session may be passed in, in which case close() leaves it open.
+        """
         self.base_url = "https://api.github.com"
         self.headers = {
             'Accept': 'application/vnd.github.v3+json',
             'Authorization': f'token {access_token}' if access_token else ''
         }
+        # Cached responses are keyed by token, so a client only revalidates
+        # what it fetched with its own credentials
+        self._token_digest = hashlib.sha256(self.headers['Authorization'].encode()).hexdigest()[:16]
         self.semaphore = asyncio.Semaphore(20)  # Limit concurrent connections
-        self.session = None
-        self.cache = {}
+        self.session = session
+        self._owns_session = session is None
+        self.cache: Dict[tuple, tuple] = {}  # key -> (expires_at, value)
+        self._cache_locks: Dict[tuple, asyncio.Lock] = {}
         self.retry_delay = 1  # Initial retry delay in seconds
+        self._rate_limit = (math.inf, 0.0)  # (requests remaining, reset epoch) from the last response
 
     async def _get_session(self) -> ClientSession:
         """Get or create aiohttp session with connection pooling."""
         if self.session is None or self.session.closed:
-            timeout = ClientTimeout(total=30)
-            connector = TCPConnector(limit=100, ttl_dns_cache=300)
-            self.session = ClientSession(
-                timeout=timeout,
-                connector=connector,
-                headers=self.headers
-            )
+            self.session = create_client_session()
+            self._owns_session = True
         return self.session
 
     async def _make_request(self, url: str, method='get', **kwargs) -> Any:
         """Make HTTP request with retries and rate limit handling."""
+        # Revalidate GETs seen before with their ETag; GitHub answers 304
+        # without a body and without charging rate-limit quota
+        etag_key = None
+        if method == 'get' and '/git/blobs/' not in url:
+            etag_key = (
+                self._token_digest,
+                url,
+                tuple(sorted((kwargs.get('params') or {}).items())),
+                kwargs.get('headers', {}).get('Accept')
+            )
+        known = self._etags.get(etag_key) if etag_key else None
+        if known:
+            self._etags.move_to_end(etag_key)
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'If-None-Match': known[0]}
+        kwargs['headers'] = {**self.headers, **kwargs.get('headers', {})}
+
         async with self.semaphore:  # Limit concurrent requests
             for attempt in range(3):  # Max 3 retries
+                # Spread the remaining quota over the time left until it
+                # resets instead of running into the limit
+                remaining, reset_at = self._rate_limit
+                if remaining < RATE_LIMIT_LOW_WATER:
+                    await asyncio.sleep(max(0, reset_at - time.time()) / max(remaining, 1))
+                    remaining, reset_at = self._rate_limit
+                # Spend a credit before sending, so requests already in flight
+                # count against the quota seen by the next ones; the response
+                # headers then replace the estimate with GitHub's own count
+                self._rate_limit = (remaining - 1, reset_at)
+
                 try:
                     session = await self._get_session()
                     async with getattr(session, method)(url, **kwargs) as response:
-                        if response.status == 403 and 'rate limit exceeded' in await response.text():
+                        self._update_rate_limit(response.headers)
+
+                        # Secondary rate limits name their own wait
+                        retry_after = response.headers.get('Retry-After')
+                        if response.status in (403, 429) and retry_after and retry_after.isdigit():
+                            wait_time = int(retry_after) + random.uniform(0, 1)
+                            logger.warning(f"Secondary rate limit hit, waiting {wait_time:.1f}s")
+                            await asyncio.sleep(wait_time)
+                            continue
+
+                        # The primary limit is read from the headers, so the
+                        # body of an ordinary 403 is never downloaded
+                        if response.status == 403 and response.headers.get('X-RateLimit-Remaining') == '0':
                             reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
                             wait_time = max(0, reset_time - time.time())
                             logger.warning(f"Rate limit hit, waiting {wait_time}s")
                             await asyncio.sleep(wait_time)
                             continue
                             
+                        if response.status == 304 and known:
+                            return known[1]
+
                         if response.status == 200:
+                            body = await response.read()
                             if 'application/json' in response.headers.get('content-type', ''):
-                                return await response.json()
-                            return await response.text()
+                                data = json_loads(body)
+                            else:
+                                data = body.decode('utf-8', errors='replace')
+                            etag = response.headers.get('ETag')
+                            if etag_key and etag:
+                                self._remember_etag(etag_key, etag, data, len(body))
+                            return data
                             
-                        if response.status != 429:  # Don't retry on non-rate-limit errors
+                        if response.status not in _RETRYABLE_STATUS:  # Don't retry permanent errors
                             return None
                             
                 except Exception as e:
                     logger.error(f"Request failed: {str(e)}")
-                    if attempt == 2:  # Last attempt
+                    if attempt == 2 or not isinstance(e, _RETRYABLE_ERRORS):  # Last attempt, or permanent
                         raise
                 
-                # Exponential backoff
-                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                # Exponential backoff with jitter, so parallel requests do not retry in lockstep
+                await asyncio.sleep(self.retry_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
             
             return None
 
-    @lru_cache(maxsize=100)
+    @classmethod
+    def _remember_etag(cls, key: tuple, etag: str, data: Any, size: int) -> None:
+        """Keep a response for revalidation, evicting the least recently used past ETAG_CACHE_BYTES."""
+        if size > ETAG_CACHE_BYTES:
+            return
+        old = cls._etags.pop(key, None)
+        if old:
+            cls._etag_bytes -= old[2]
+        cls._etags[key] = (etag, data, size)
+        cls._etag_bytes += size
+        while cls._etag_bytes > ETAG_CACHE_BYTES:
+            _, evicted = cls._etags.popitem(last=False)
+            cls._etag_bytes -= evicted[2]
+
+    def _update_rate_limit(self, headers) -> None:
+        """Record the rate limit quota reported with a response."""
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_at = headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset_at is not None:
+            try:
+                self._rate_limit = (int(remaining), int(reset_at))
+            except ValueError:
+                pass
+
+    async def _cached_get(self, key: tuple, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key if it is younger than ttl seconds,
+        otherwise fetch and cache it. Concurrent misses on the same key share
+        a single fetch. None results are not cached.
+        """
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        lock = self._cache_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            value = await fetch()
+            if value is not None:
+                self.cache[key] = (time.monotonic() + ttl, value)
+            return value
+
     async def get_repository_contents(self, owner: str, repo: str, path: str = "") -> List[Dict[str, Any]]:
         """Cached repository contents."""
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-        data = await self._make_request(url)
+        data = await self._cached_get(
+            ('contents', owner, repo, path), CONTENTS_TTL, lambda: self._make_request(url)
+        )
         return data if isinstance(data, list) else [data]
 
+    async def get_default_branch(self, owner: str, repo: str) -> str:
+        """Get the default branch of a repository."""
+        async def fetch():
+            data = await self._make_request(f"{self.base_url}/repos/{owner}/{repo}")
+            return data.get('default_branch', 'main') if isinstance(data, dict) else None
+
+        branch = await self._cached_get(('default_branch', owner, repo), DEFAULT_BRANCH_TTL, fetch)
+        return branch or "main"  # Default fallback
+
+    async def get_ref_sha(self, owner: str, repo: str, ref: str) -> str | None:
+        """Get the SHA of a branch head."""
+        async def fetch():
+            data = await self._make_request(f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{ref}")
+            return data.get('object', {}).get('sha') if isinstance(data, dict) else None
+
+        return await self._cached_get(('ref_sha', owner, repo, ref), REF_SHA_TTL, fetch)
+
+    async def get_tree_recursive(
+        self, owner: str, repo: str, sha: str, prefix: str = "",
+        on_blob: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        List every blob under a tree with one recursive Git Trees call. If
+        GitHub truncates the listing, this level is listed on its own and
+        each subtree is descended into separately. on_blob, if given, is
+        called with each blob as soon as its level has been listed.
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{sha}"
+        data = await self._make_request(url, params={'recursive': '1'})
+        if not isinstance(data, dict):
+            return []
+
+        truncated = bool(data.get('truncated'))
+        if truncated:
+            logger.warning(f"Tree {prefix or '/'} of {owner}/{repo} is truncated, listing subtrees separately")
+            data = await self._make_request(url)
+            if not isinstance(data, dict):
+                return []
+
+        blobs = [
+            {**item, 'path': f"{prefix}{item['path']}"}
+            for item in data.get('tree', [])
+            if item['type'] == 'blob'
+        ]
+        if on_blob:
+            for blob in blobs:
+                on_blob(blob)
+
+        if truncated:
+            subtrees = [item for item in data.get('tree', []) if item['type'] == 'tree']
+            nested = await asyncio.gather(*[
+                self.get_tree_recursive(owner, repo, item['sha'], f"{prefix}{item['path']}/", on_blob)
+                for item in subtrees
+            ])
+        else:
+            nested = []
+
+        for sub_blobs in nested:
+            blobs.extend(sub_blobs)
+        return blobs
+
+    async def get_blob(self, owner: str, repo: str, sha: str) -> str | None:
+        """
+        Get a file's content by blob SHA, or None for a binary file. Blobs are
+        immutable, so results are memoized by SHA, in memory and, if
+        available, on disk.
+        """
+        async def fetch():
+            disk = _blob_disk_cache()
+            if disk is not None:
+                content = await asyncio.to_thread(disk.get, sha)
+                if content is not None:
+                    return content
+            content = await download()
+            if content is not None and disk is not None:
+                await asyncio.to_thread(disk.set, sha, content)
+            return content
+
+        async def download():
+            url = f"{self.base_url}/repos/{owner}/{repo}/git/blobs/{sha}"
+            # The raw media type skips the JSON envelope and the base64
+            # encoding; the JSON form is the fallback if it is refused
+            data = await self._make_request(url, headers={'Accept': RAW_MEDIA_TYPE})
+            if isinstance(data, str):
+                return None if '\x00' in data[:BINARY_SNIFF_BYTES] else data
+            if data is None:
+                data = await self._make_request(url)
+            if not data or 'content' not in data:
+                return None
+            try:
+                if len(data['content']) > BASE64_THREAD_THRESHOLD:
+                    raw = await asyncio.to_thread(b64decode, data['content'])
+                else:
+                    raw = b64decode(data['content'])
+                if b'\x00' in raw[:BINARY_SNIFF_BYTES]:
+                    return None
+                # Replace stray non-UTF-8 bytes, as the raw path does, rather
+                # than dropping the whole file over one of them
+                return raw.decode('utf-8', errors='replace')
+            except ValueError as e:  # Bad base64
+                logger.error(f"Error decoding blob {sha} in {owner}/{repo}: {e}")
+                return None
+
+        return await self._cached_get(('blob', sha), math.inf, fetch)
+
+    async def get_blobs(self, owner: str, repo: str, shas: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Get several files' contents by blob SHA. Blobs not yet cached are
+        fetched together with one GraphQL request; those it cannot return
+        as text (binary, truncated, or no token to authenticate with) are
+        left to get_blob.
+        """
+        binary = set()
+        missing = [sha for sha in dict.fromkeys(shas) if ('blob', sha) not in self.cache]
+        disk = _blob_disk_cache()
+        if missing and disk is not None:
+            missing = await asyncio.to_thread(lambda: [sha for sha in missing if sha not in disk])
+
+        if missing and self.headers['Authorization']:
+            # Aliases give each blob its own field in the one response
+            fields = " ".join(
+                f"b{i}: object(oid: {json.dumps(sha)}) {{ ... on Blob {{ text isBinary isTruncated }} }}"
+                for i, sha in enumerate(missing)
+            )
+            query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+            data = await self._make_request(
+                f"{self.base_url}/graphql", method='post',
+                json={'query': query, 'variables': {'owner': owner, 'name': repo}}
+            )
+            found = ((data or {}).get('data') or {}).get('repository') or {}
+            texts = {}
+            for i, sha in enumerate(missing):
+                blob = found.get(f"b{i}")
+                if blob and blob.get('isBinary'):
+                    binary.add(sha)
+                elif blob and blob.get('text') is not None and not blob.get('isBinary') and not blob.get('isTruncated'):
+                    texts[sha] = blob['text']
+                    self.cache[('blob', sha)] = (math.inf, blob['text'])
+            if texts and disk is not None:
+                await asyncio.to_thread(lambda: [disk.set(sha, text) for sha, text in texts.items()])
+
+        # Everything now comes from the caches, apart from the blobs GraphQL
+        # left out, which are downloaded one by one; binary ones are skipped
+        wanted = [sha for sha in shas if sha not in binary]
+        contents = await asyncio.gather(*[self.get_blob(owner, repo, sha) for sha in wanted])
+        return {**dict.fromkeys(binary), **dict(zip(wanted, contents))}
+
     async def analyze_repository(self, owner: str, repo: str) -> List[Dict[str, Any]]:
         """Analyze repository with optimized parallel processing."""
         logger.info(f"Starting analysis of {owner}/{repo}")
-        analyzed_files = []
-        seen_paths = set()
-        
-        async def process_path(path: str) -> List[str]:
-            """Process a single path and return new paths to check."""
-            if path in seen_paths:
-                return []
-            seen_paths.add(path)
-            
-            contents = await self.get_repository_contents(owner, repo, path)
-            new_paths = []
-            
-            for item in contents:
-                if item['type'] == 'dir':
-                    new_paths.append(item['path'])
-                elif (item['type'] == 'file' and 
-                      item['path'].endswith(('.py', '.js', '.ts', '.tsx', '.jsx')) and
-                      item.get('size', 0) <= 1024 * 1024):  # Skip files > 1MB
-                    analyzed_files.append(item)
-            
-            return new_paths
-
-        # Process all paths concurrently with worker pool
-        paths_to_process = ['']
-        while paths_to_process:
-            # Process multiple paths concurrently
-            tasks = [process_path(path) for path in paths_to_process]
-            results = await asyncio.gather(*tasks)
-            paths_to_process = [path for sublist in results for path in sublist]  # Flatten
-
-        # Now fetch all file contents concurrently
-        async def fetch_file_batch(files: List[Dict]) -> List[Dict[str, Any]]:
-            tasks = []
-            for file in files:
-                url = file['url']
-                tasks.append(self._make_request(url))
-            
-            results = await asyncio.gather(*tasks)
-            processed_files = []
-            
-            for file, result in zip(files, results):
-                if result and 'content' in result:
-                    try:
-                        content = base64.b64decode(result['content']).decode('utf-8')
-                        processed_files.append({
-                            'path': file['path'],
-                            'content': content,
-                            'type': 'file',
-                            'size': file['size']
-                        })
-                    except Exception as e:
-                        logger.error(f"Error processing {file['path']}: {e}")
-            
-            return processed_files
 
-        # Process files in larger batches
-        BATCH_SIZE = 30  # Increased batch size
-        results = []
-        for i in range(0, len(analyzed_files), BATCH_SIZE):
-            batch = analyzed_files[i:i + BATCH_SIZE]
-            batch_results = await fetch_file_batch(batch)
-            results.extend(batch_results)
+        # Enumerate the whole default branch with the Git Trees API instead
+        # of one contents request per directory
+        branch = await self.get_default_branch(owner, repo)
+        commit_sha = await self.get_ref_sha(owner, repo, branch)
+        if not commit_sha:
+            logger.error(f"Could not resolve {branch} in {owner}/{repo}")
+            return []
+
+        # Download blobs from a queue while the tree is still being listed, so
+        # the subtree requests of a truncated tree overlap with the downloads
+        queue: asyncio.Queue = asyncio.Queue()
+        contents: Dict[str, str] = {}
+
+        def enqueue(item: Dict[str, Any]) -> None:
+            if (item['path'][-1:] in _SOURCE_LAST_CHARS and item['path'].endswith(_SOURCE_SUFFIXES) and
+                    item.get('size', 0) <= 1024 * 1024):  # Skip files > 1MB
+                queue.put_nowait(item)
+
+        async def fetch_blobs() -> None:
+            done = False
+            while not done:
+                # Take whatever is queued, up to one GraphQL batch
+                item = await queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                batch_bytes = item.get('size', 0)
+                while (len(batch) < GRAPHQL_BATCH_SIZE and batch_bytes < GRAPHQL_BATCH_BYTES and
+                       not queue.empty()):
+                    item = queue.get_nowait()
+                    if item is None:
+                        done = True
+                        break
+                    batch.append(item)
+                    batch_bytes += item.get('size', 0)
+
+                blobs = await self.get_blobs(owner, repo, [item['sha'] for item in batch])
+                for item in batch:
+                    if blobs[item['sha']] is not None:
+                        contents[item['path']] = blobs[item['sha']]
+
+        workers = [asyncio.create_task(fetch_blobs()) for _ in range(BLOB_WORKERS)]
+        try:
+            tree = await self.get_tree_recursive(owner, repo, commit_sha, on_blob=enqueue)
+            for _ in workers:
+                queue.put_nowait(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        # Keep tree order so the result does not depend on download timing
+        results = [
+            {
+                'path': item['path'],
+                'content': contents[item['path']],
+                'type': 'file',
+                'size': item['size']
+            }
+            for item in tree
+            if item['path'] in contents
+        ]
 
         logger.info(f"Completed analysis of {owner}/{repo}. Found {len(results)} files.")
         return results
 
+    async def close(self) -> None:
+        """Close the session, if this client opened it."""
+        if self._owns_session and self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
     async def __aenter__(self):
         """Context manager support."""
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Clean up session on exit."""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        await self.close()
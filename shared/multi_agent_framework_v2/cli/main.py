@@ -1,5 +1,7 @@
+from functools import cache
+
 import typer
-from backend.orchestrator import AgentOrchestrator, apply_patch_to_file
+from sqlalchemy import select
 from backend.db.database import SessionLocal
 from backend.db.models import ReviewSession, Suggestion
 from dotenv import load_dotenv
@@ -7,17 +9,41 @@ load_dotenv()
 
 app = typer.Typer(help="CLI tool for code generation and review")
 
+# Built once so SQLAlchemy's statement cache serves every lookup after the first
+_LATEST_SESSION = select(ReviewSession).order_by(ReviewSession.id.desc()).limit(1)
+
+@cache
+def _get_orchestrator():
+    """
+    Build the orchestrator on first use. Its agents and their dependencies
+    are imported only then, so the database-only commands start faster.
+    """
+    from backend.orchestrator import AgentOrchestrator
+    return AgentOrchestrator()
+
+def _load_session(db, session_id):
+    """Load the given review session, or the latest one; prints why and returns None if missing."""
+    if session_id is None:
+        session_obj = db.execute(_LATEST_SESSION).scalar_one_or_none()
+        if not session_obj:
+            print("No review sessions found.")
+    else:
+        session_obj = db.get(ReviewSession, session_id)
+        if not session_obj:
+            print(f"Session {session_id} not found.")
+    return session_obj
+
 @app.command()
 def generate(prompt: str):
     """Generate code from a prompt using AI (CoderAgent)."""
-    orchestrator = AgentOrchestrator()
+    orchestrator = _get_orchestrator()
     code = orchestrator.generate_code(prompt)
     print(code)
 
 @app.command()
 def review(path: str):
     """Review code in the given repository path using multiple agents."""
-    orchestrator = AgentOrchestrator()
+    orchestrator = _get_orchestrator()
     session, suggestions = orchestrator.run_review(path)
     print(f"Review session {session.id} complete. Found {len(suggestions)} suggestions.")
     print("Use 'suggestions' to view details, 'summary' for an overview.")
@@ -25,61 +51,44 @@ def review(path: str):
 @app.command()
 def suggestions(session_id: int = typer.Option(None, help="Review session ID (defaults to latest session)")):
     """View suggestions from a review session."""
-    db = SessionLocal()
-    try:
-        if session_id is None:
-            session_obj = db.query(ReviewSession).order_by(ReviewSession.id.desc()).first()
-            if not session_obj:
-                print("No review sessions found.")
-                return
-        else:
-            session_obj = db.query(ReviewSession).get(session_id)
-            if not session_obj:
-                print(f"Session {session_id} not found.")
-                return
-        session_id_val = session_obj.id
-        suggs = db.query(Suggestion).filter(Suggestion.session_id == session_id_val).all()
-        if not suggs:
-            print("No suggestions found for session.")
+    with SessionLocal() as db:
+        session_obj = _load_session(db, session_id)
+        if not session_obj:
             return
+        session_id_val = session_obj.id
+        # Stream the rows in batches so output starts before the whole
+        # session is loaded
+        suggs = db.query(Suggestion).filter(Suggestion.session_id == session_id_val).yield_per(100)
+        found = False
         for sugg in suggs:
+            found = True
             print(f"\nSuggestion {sugg.id} by {sugg.agent} [status: {sugg.status}]")
             print(f"Message: {sugg.message}")
             if sugg.patch:
                 print("Patch:\n" + sugg.patch)
+        if not found:
+            print("No suggestions found for session.")
+            return
         if session_obj.summary:
             print("\nSummary:\n" + session_obj.summary)
-    finally:
-        db.close()
 
 @app.command()
 def summary(session_id: int = typer.Option(None, help="Review session ID (defaults to latest session)")):
     """View the summary from a review session."""
-    db = SessionLocal()
-    try:
-        if session_id is None:
-            session_obj = db.query(ReviewSession).order_by(ReviewSession.id.desc()).first()
-            if not session_obj:
-                print("No review sessions found.")
-                return
-        else:
-            session_obj = db.query(ReviewSession).get(session_id)
-            if not session_obj:
-                print(f"Session {session_id} not found.")
-                return
+    with SessionLocal() as db:
+        session_obj = _load_session(db, session_id)
+        if not session_obj:
+            return
         if session_obj.summary:
             print(session_obj.summary)
         else:
             print("No summary available for this session.")
-    finally:
-        db.close()
 
 @app.command()
 def apply(suggestion_id: int):
     """Apply a patch suggestion to the codebase."""
-    db = SessionLocal()
-    try:
-        sugg = db.query(Suggestion).get(suggestion_id)
+    with SessionLocal() as db:
+        sugg = db.get(Suggestion, suggestion_id)
         if not sugg:
             print(f"Suggestion {suggestion_id} not found.")
             return
@@ -89,10 +98,11 @@ def apply(suggestion_id: int):
         if sugg.status == "applied":
             print("Suggestion has already been applied.")
             return
-        session_obj = db.query(ReviewSession).get(sugg.session_id)
+        session_obj = db.get(ReviewSession, sugg.session_id)
         if not session_obj:
             print("Associated review session not found.")
             return
+        from backend.orchestrator import apply_patch_to_file
         success = apply_patch_to_file(sugg.patch, session_obj.repo_path)
         if success:
             sugg.status = "applied"
@@ -100,15 +110,12 @@ def apply(suggestion_id: int):
             print(f"Applied suggestion {suggestion_id} to file {sugg.file_path}.")
         else:
             print("Failed to apply patch.")
-    finally:
-        db.close()
 
 @app.command()
 def reject(suggestion_id: int):
     """Reject a patch suggestion (mark as rejected)."""
-    db = SessionLocal()
-    try:
-        sugg = db.query(Suggestion).get(suggestion_id)
+    with SessionLocal() as db:
+        sugg = db.get(Suggestion, suggestion_id)
         if not sugg:
             print(f"Suggestion {suggestion_id} not found.")
             return
@@ -118,8 +125,6 @@ def reject(suggestion_id: int):
         sugg.status = "rejected"
         db.commit()
         print(f"Suggestion {suggestion_id} marked as rejected.")
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     app()